@@ -1,4 +1,12 @@
+import marshal
 import math
+import os
+import sys
+import time
+# collections.abc and operator only re-export these, and importing either of them costs
+# more than the rest of this module's startup. os has already loaded _collections_abc
+from _collections_abc import Mapping
+from _operator import itemgetter
 
 
 class EquationDefinition:
@@ -8,8 +16,104 @@ class EquationDefinition:
         self.solve_rules = solve_rules
 
 
-def make_rule(requires, formula):
-    return {"requires": requires, "formula": formula}
+# a rule's kernel takes its required values positionally, in the same order as
+# "requires", so lambda u, a, t: u + a * t needs ["u", "a", "t"]. "arguments" pulls those
+# values out of a dict in that order, and "formula" is the same rule called with the dict.
+def make_rule(requires, kernel):
+    arguments = _arguments_getter(requires)
+    return {
+        "requires": requires,
+        "kernel": kernel,
+        "arguments": arguments,
+        "formula": lambda values: kernel(*arguments(values)),
+    }
+
+
+# always returns a tuple, even for one required value (itemgetter alone wouldn't)
+def _arguments_getter(requires):
+    if len(requires) == 1:
+        variable = requires[0]
+        return lambda values: (values[variable],)
+    if not requires:
+        return lambda values: ()
+    return itemgetter(*requires)
+
+
+# behaves like the old {topic name: [EquationDefinition, ...]} dict, but a topic's
+# equations are only built the first time that topic is looked up, so a process that
+# needs one topic doesn't pay for all of them at import. library[name] = equations
+# registers a topic like register_topic.
+class TopicLibrary(Mapping):
+    def __init__(self, builders=None):
+        self.builders = {}
+        self.topics = {}
+        # sha256 of every equation file loaded into this library -> its topic names
+        self.loaded_files = {}
+        # called with (topic name, equations) whenever a topic is registered or built, and
+        # with (topic name, None) when a topic is registered to be built on first lookup
+        self.listeners = []
+        for topic_name, builder in (builders or {}).items():
+            self.register_topic(topic_name, builder)
+
+    # builder is either a list of equations or a function returning one
+    def register_topic(self, topic_name, builder):
+        self.topics.pop(topic_name, None)
+        if callable(builder):
+            self.builders[topic_name] = builder
+            self._notify(topic_name, None)
+        else:
+            equations = list(builder)
+            self.builders[topic_name] = None
+            self.topics[topic_name] = equations
+            self._notify(topic_name, equations)
+
+    # adds equations to a topic that may already exist, keeping the ones it had
+    def extend_topic(self, topic_name, builder):
+        if topic_name not in self.builders:
+            self.register_topic(topic_name, builder)
+            return
+
+        previous = self.builders[topic_name] or self.topics[topic_name]
+
+        def combined_builder():
+            equations = list(previous() if callable(previous) else previous)
+            return equations + list(builder() if callable(builder) else builder)
+
+        self.register_topic(topic_name, combined_builder)
+
+    def is_loaded(self, topic_name):
+        return topic_name in self.topics
+
+    def loaded_items(self):
+        return [(topic_name, self.topics[topic_name]) for topic_name in self.builders if topic_name in self.topics]
+
+    def __getitem__(self, topic_name):
+        equations = self.topics.get(topic_name)
+        if equations is None:
+            builder = self.builders[topic_name]
+            equations = builder()
+            self.topics[topic_name] = equations
+            self._notify(topic_name, equations)
+        return equations
+
+    def __setitem__(self, topic_name, equations):
+        self.register_topic(topic_name, equations)
+
+    def get(self, topic_name, default=None):
+        return self[topic_name] if topic_name in self.builders else default
+
+    def __iter__(self):
+        return iter(self.builders)
+
+    def __len__(self):
+        return len(self.builders)
+
+    def __contains__(self, topic_name):
+        return topic_name in self.builders
+
+    def _notify(self, topic_name, equations):
+        for listener in self.listeners:
+            listener(topic_name, equations)
 
 
 def sin_deg(angle):
@@ -28,11 +132,7 @@ def sqrt_checked(value, label):
     return math.sqrt(value)
 
 
-def solve_motion_2_time(values):
-    u = values["u"]
-    a = values["a"]
-    s = values["s"]
-
+def solve_motion_2_time(s, u, a):
     if abs(a) < 1e-12:
         if abs(u) < 1e-12:
             raise ValueError("Cannot solve t: both a and u are zero.")
@@ -51,9 +151,210 @@ def solve_motion_2_time(values):
         return min(non_negative)
     return t1
 
-# looottts of topics
-TOPIC_LIBRARY = {
-    "Motion of a moving object": [
+
+# stable codes for the ways a row can fail, used by the masked (exception free) bulk mode
+ERROR_NONE = 0
+ERROR_DIVISION_BY_ZERO = 1
+ERROR_NEGATIVE_SQUARE_ROOT = 2
+ERROR_NO_REAL_ANGLE = 3
+ERROR_ZERO_ACCELERATION_AND_VELOCITY = 4
+ERROR_NEGATIVE_DISCRIMINANT = 5
+ERROR_NO_NUMERIC_SOLUTION = 6
+ERROR_NOT_A_NUMBER = 7
+ERROR_OTHER = 8
+
+ERROR_DESCRIPTIONS = {
+    ERROR_NONE: "solved",
+    ERROR_DIVISION_BY_ZERO: "division by zero occurred.",
+    ERROR_NEGATIVE_SQUARE_ROOT: "square-root input is a negative.",
+    ERROR_NO_REAL_ANGLE: "No real-angle solution exists for this Snell's law input.",
+    ERROR_ZERO_ACCELERATION_AND_VELOCITY: "Cannot solve t: both a and u are zero.",
+    ERROR_NEGATIVE_DISCRIMINANT: "Cannot solve t: discriminant is negative.",
+    ERROR_NO_NUMERIC_SOLUTION: "no numeric solution found.",
+    ERROR_NOT_A_NUMBER: "result is not a number (nan input?).",
+    ERROR_OTHER: "could not solve this row.",
+}
+
+_ERROR_MESSAGE_CODES = [
+    ("square-root input is a negative", ERROR_NEGATIVE_SQUARE_ROOT),
+    ("No real-angle solution", ERROR_NO_REAL_ANGLE),
+    ("both a and u are zero", ERROR_ZERO_ACCELERATION_AND_VELOCITY),
+    ("discriminant is negative", ERROR_NEGATIVE_DISCRIMINANT),
+    ("no numeric solution", ERROR_NO_NUMERIC_SOLUTION),
+]
+
+
+def classify_solver_error(error):
+    if isinstance(error, ZeroDivisionError):
+        return ERROR_DIVISION_BY_ZERO
+    message = str(error)
+    for fragment, code in _ERROR_MESSAGE_CODES:
+        if fragment in message:
+            return code
+    return ERROR_OTHER
+
+
+# masked kernels return nan and note an error code instead of raising. declarative formulas
+# are compiled a second time with division, powers and the checked helpers swapped for
+# masked versions; the built-in rules are masked by catching. the code is kept per thread
+# and only looked at for rows that are nan.
+_MASKED_STATE = {}
+
+
+# the threading.local holding the codes, made on first use. setdefault keeps two threads
+# that get here at once on the same one
+def _masked_state():
+    state = _MASKED_STATE.get("local")
+    if state is None:
+        import threading
+
+        state = _MASKED_STATE.setdefault("local", threading.local())
+    return state
+
+
+def _masked_fail(code):
+    state = _masked_state()
+    if not getattr(state, "code", ERROR_NONE):
+        state.code = code
+    return math.nan
+
+
+def _take_masked_code():
+    state = _masked_state()
+    code = getattr(state, "code", ERROR_NONE)
+    state.code = ERROR_NONE
+    return code
+
+
+def _masked_div(numerator, denominator):
+    if denominator == 0:
+        return _masked_fail(ERROR_DIVISION_BY_ZERO)
+    return numerator / denominator
+
+
+def _masked_pow(base, exponent):
+    if base == 0 and exponent < 0:
+        return _masked_fail(ERROR_DIVISION_BY_ZERO)
+    result = base ** exponent
+    if isinstance(result, complex):
+        return _masked_fail(ERROR_OTHER)
+    return result
+
+
+def _masked_sqrt_checked(value, label):
+    if value < 0:
+        return _masked_fail(ERROR_NEGATIVE_SQUARE_ROOT)
+    return math.sqrt(value)
+
+
+def _masked_asin_deg(value):
+    if value < -1 or value > 1:
+        return _masked_fail(ERROR_NO_REAL_ANGLE)
+    return math.degrees(math.asin(value))
+
+
+# function name allowed in declarative formulas -> masked replacement
+MASKED_FORMULA_FUNCTIONS = {
+    "sqrt": _masked_sqrt_checked,
+    "asin_deg": _masked_asin_deg,
+}
+
+_MASKED_PRIMITIVES = {
+    "_masked_div": _masked_div,
+    "_masked_pow": _masked_pow,
+    "_masked_fail": _masked_fail,
+}
+
+
+def _kernel_arguments(names):
+    import ast
+
+    return ast.arguments(
+        posonlyargs=[],
+        args=[ast.arg(arg=name) for name in names],
+        kwonlyargs=[],
+        kw_defaults=[],
+        defaults=[],
+    )
+
+
+# swaps division and powers in a kernel's AST (in place) for the masked primitives
+def _mask_node(node):
+    import ast
+
+    for field, value in ast.iter_fields(node):
+        if isinstance(value, ast.AST):
+            setattr(node, field, _mask_node(value))
+        elif isinstance(value, list):
+            setattr(node, field, [_mask_node(item) if isinstance(item, ast.AST) else item for item in value])
+
+    if not isinstance(node, ast.BinOp):
+        return node
+    if isinstance(node.op, ast.Div):
+        name = "_masked_div"
+    elif isinstance(node.op, ast.Pow):
+        # x ** 2 and friends can't divide by zero or go complex
+        exponent = node.right
+        if isinstance(exponent, ast.Constant) and isinstance(exponent.value, int) and exponent.value >= 0:
+            return node
+        name = "_masked_pow"
+    else:
+        return node
+    call = ast.Call(func=ast.Name(id=name, ctx=ast.Load()), args=[node.left, node.right], keywords=[])
+    return ast.copy_location(call, node)
+
+
+# wraps the masked kernel in "def _make_kernel(<masked helpers>): ...; return _kernel" so the
+# replacements are parameters of the factory and nothing is added to the formula's globals.
+# floor division and modulo have no masked version, so those kernels aren't masked
+def _masked_kernel_factory_code(kernel_def, helper_names, filename):
+    import ast
+
+    for node in ast.walk(kernel_def):
+        if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.FloorDiv, ast.Mod)):
+            return None
+    kernel_def = _mask_node(kernel_def)
+    factory_def = ast.FunctionDef(
+        name="_make_kernel",
+        args=_kernel_arguments(list(_MASKED_PRIMITIVES) + list(helper_names)),
+        body=[kernel_def, ast.Return(value=ast.Name(id="_kernel", ctx=ast.Load()))],
+        decorator_list=[],
+        returns=None,
+    )
+    module = ast.fix_missing_locations(ast.Module(body=[factory_def], type_ignores=[]))
+    return compile(module, filename, "exec")
+
+
+def _make_masked_kernel(factory_code, global_namespace, replacements):
+    namespace = {}
+    exec(factory_code, global_namespace, namespace)
+    helpers = [replacements[name] for name in sorted(replacements)]
+    return namespace["_make_kernel"](*_MASKED_PRIMITIVES.values(), *helpers)
+
+
+# a rule without a masked kernel is masked by catching: still nan plus a code per row
+def _catching_kernel(solve_rule):
+    kernel = solve_rule["kernel"]
+
+    def caught(*values):
+        try:
+            return kernel(*values)
+        except (ArithmeticError, ValueError) as error:
+            return _masked_fail(classify_solver_error(error))
+
+    return caught
+
+
+def get_masked_kernel(solve_rule):
+    masked = solve_rule.get("masked_kernel")
+    if masked is None:
+        masked = _catching_kernel(solve_rule)
+        solve_rule["masked_kernel"] = masked
+    return masked
+
+
+def _build_motion_equations():
+    return [
         EquationDefinition(
             name="1st Equation of Motion (v = u + a*t)",
             variables={
@@ -63,10 +364,10 @@ TOPIC_LIBRARY = {
                 "t": "Time (s)",
             },
             solve_rules={
-                "v": make_rule(["u", "a", "t"], lambda x: x["u"] + x["a"] * x["t"]),
-                "u": make_rule(["v", "a", "t"], lambda x: x["v"] - x["a"] * x["t"]),
-                "a": make_rule(["v", "u", "t"], lambda x: (x["v"] - x["u"]) / x["t"]),
-                "t": make_rule(["v", "u", "a"], lambda x: (x["v"] - x["u"]) / x["a"]),
+                "v": make_rule(["u", "a", "t"], lambda u, a, t: u + a * t),
+                "u": make_rule(["v", "a", "t"], lambda v, a, t: v - a * t),
+                "a": make_rule(["v", "u", "t"], lambda v, u, t: (v - u) / t),
+                "t": make_rule(["v", "u", "a"], lambda v, u, a: (v - u) / a),
             },
         ),
         EquationDefinition(
@@ -78,9 +379,9 @@ TOPIC_LIBRARY = {
                 "t": "Time (s)",
             },
             solve_rules={
-                "s": make_rule(["u", "a", "t"], lambda x: x["u"] * x["t"] + 0.5 * x["a"] * (x["t"] ** 2)),
-                "u": make_rule(["s", "a", "t"], lambda x: (x["s"] - 0.5 * x["a"] * (x["t"] ** 2)) / x["t"]),
-                "a": make_rule(["s", "u", "t"], lambda x: 2 * (x["s"] - x["u"] * x["t"]) / (x["t"] ** 2)),
+                "s": make_rule(["u", "a", "t"], lambda u, a, t: u * t + 0.5 * a * (t ** 2)),
+                "u": make_rule(["s", "a", "t"], lambda s, a, t: (s - 0.5 * a * (t ** 2)) / t),
+                "a": make_rule(["s", "u", "t"], lambda s, u, t: 2 * (s - u * t) / (t ** 2)),
                 "t": make_rule(["s", "u", "a"], solve_motion_2_time),
             },
         ),
@@ -93,10 +394,10 @@ TOPIC_LIBRARY = {
                 "s": "Displacement (m)",
             },
             solve_rules={
-                "v": make_rule(["u", "a", "s"], lambda x: sqrt_checked((x["u"] ** 2) + (2 * x["a"] * x["s"]), "v")),
-                "u": make_rule(["v", "a", "s"], lambda x: sqrt_checked((x["v"] ** 2) - (2 * x["a"] * x["s"]), "u")),
-                "a": make_rule(["v", "u", "s"], lambda x: ((x["v"] ** 2) - (x["u"] ** 2)) / (2 * x["s"])),
-                "s": make_rule(["v", "u", "a"], lambda x: ((x["v"] ** 2) - (x["u"] ** 2)) / (2 * x["a"])),
+                "v": make_rule(["u", "a", "s"], lambda u, a, s: sqrt_checked((u ** 2) + (2 * a * s), "v")),
+                "u": make_rule(["v", "a", "s"], lambda v, a, s: sqrt_checked((v ** 2) - (2 * a * s), "u")),
+                "a": make_rule(["v", "u", "s"], lambda v, u, s: ((v ** 2) - (u ** 2)) / (2 * s)),
+                "s": make_rule(["v", "u", "a"], lambda v, u, a: ((v ** 2) - (u ** 2)) / (2 * a)),
             },
         ),
         EquationDefinition(
@@ -108,14 +409,17 @@ TOPIC_LIBRARY = {
                 "t": "Time (s)",
             },
             solve_rules={
-                "s": make_rule(["u", "v", "t"], lambda x: ((x["u"] + x["v"]) / 2) * x["t"]),
-                "u": make_rule(["s", "v", "t"], lambda x: (2 * x["s"] / x["t"]) - x["v"]),
-                "v": make_rule(["s", "u", "t"], lambda x: (2 * x["s"] / x["t"]) - x["u"]),
-                "t": make_rule(["s", "u", "v"], lambda x: (2 * x["s"]) / (x["u"] + x["v"])),
+                "s": make_rule(["u", "v", "t"], lambda u, v, t: ((u + v) / 2) * t),
+                "u": make_rule(["s", "v", "t"], lambda s, v, t: (2 * s / t) - v),
+                "v": make_rule(["s", "u", "t"], lambda s, u, t: (2 * s / t) - u),
+                "t": make_rule(["s", "u", "v"], lambda s, u, v: (2 * s) / (u + v)),
             },
         ),
-    ],
-    "Hookes Law and Moments": [
+    ]
+
+
+def _build_hookes_law_equations():
+    return [
         EquationDefinition(
             name="Density (rho = m / V)",
             variables={
@@ -124,9 +428,9 @@ TOPIC_LIBRARY = {
                 "V": "Volume (m^3)",
             },
             solve_rules={
-                "rho": make_rule(["m", "V"], lambda x: x["m"] / x["V"]),
-                "m": make_rule(["rho", "V"], lambda x: x["rho"] * x["V"]),
-                "V": make_rule(["rho", "m"], lambda x: x["m"] / x["rho"]),
+                "rho": make_rule(["m", "V"], lambda m, V: m / V),
+                "m": make_rule(["rho", "V"], lambda rho, V: rho * V),
+                "V": make_rule(["rho", "m"], lambda rho, m: m / rho),
             },
         ),
         EquationDefinition(
@@ -137,9 +441,9 @@ TOPIC_LIBRARY = {
                 "x": "Extension (m)",
             },
             solve_rules={
-                "F": make_rule(["k", "x"], lambda x: x["k"] * x["x"]),
-                "k": make_rule(["F", "x"], lambda x: x["F"] / x["x"]),
-                "x": make_rule(["F", "k"], lambda x: x["F"] / x["k"]),
+                "F": make_rule(["k", "x"], lambda k, x: k * x),
+                "k": make_rule(["F", "x"], lambda F, x: F / x),
+                "x": make_rule(["F", "k"], lambda F, k: F / k),
             },
         ),
         EquationDefinition(
@@ -150,9 +454,9 @@ TOPIC_LIBRARY = {
                 "k2": "Spring constant 2 (N/m)",
             },
             solve_rules={
-                "k_total": make_rule(["k1", "k2"], lambda x: 1 / ((1 / x["k1"]) + (1 / x["k2"]))),
-                "k1": make_rule(["k_total", "k2"], lambda x: 1 / ((1 / x["k_total"]) - (1 / x["k2"]))),
-                "k2": make_rule(["k_total", "k1"], lambda x: 1 / ((1 / x["k_total"]) - (1 / x["k1"]))),
+                "k_total": make_rule(["k1", "k2"], lambda k1, k2: 1 / ((1 / k1) + (1 / k2))),
+                "k1": make_rule(["k_total", "k2"], lambda k_total, k2: 1 / ((1 / k_total) - (1 / k2))),
+                "k2": make_rule(["k_total", "k1"], lambda k_total, k1: 1 / ((1 / k_total) - (1 / k1))),
             },
         ),
         EquationDefinition(
@@ -163,9 +467,9 @@ TOPIC_LIBRARY = {
                 "k2": "Spring constant 2 (N/m)",
             },
             solve_rules={
-                "k_total": make_rule(["k1", "k2"], lambda x: x["k1"] + x["k2"]),
-                "k1": make_rule(["k_total", "k2"], lambda x: x["k_total"] - x["k2"]),
-                "k2": make_rule(["k_total", "k1"], lambda x: x["k_total"] - x["k1"]),
+                "k_total": make_rule(["k1", "k2"], lambda k1, k2: k1 + k2),
+                "k1": make_rule(["k_total", "k2"], lambda k_total, k2: k_total - k2),
+                "k2": make_rule(["k_total", "k1"], lambda k_total, k1: k_total - k1),
             },
         ),
         EquationDefinition(
@@ -176,9 +480,9 @@ TOPIC_LIBRARY = {
                 "d": "Perpendicular distance from pivot (m)",
             },
             solve_rules={
-                "M": make_rule(["F", "d"], lambda x: x["F"] * x["d"]),
-                "F": make_rule(["M", "d"], lambda x: x["M"] / x["d"]),
-                "d": make_rule(["M", "F"], lambda x: x["M"] / x["F"]),
+                "M": make_rule(["F", "d"], lambda F, d: F * d),
+                "F": make_rule(["M", "d"], lambda M, d: M / d),
+                "d": make_rule(["M", "F"], lambda M, F: M / F),
             },
         ),
         EquationDefinition(
@@ -188,12 +492,15 @@ TOPIC_LIBRARY = {
                 "anticlockwise": "Total anticlockwise moment (N m)",
             },
             solve_rules={
-                "clockwise": make_rule(["anticlockwise"], lambda x: x["anticlockwise"]),
-                "anticlockwise": make_rule(["clockwise"], lambda x: x["clockwise"]),
+                "clockwise": make_rule(["anticlockwise"], lambda anticlockwise: anticlockwise),
+                "anticlockwise": make_rule(["clockwise"], lambda clockwise: clockwise),
             },
         ),
-    ],
-    "Energy and Work": [
+    ]
+
+
+def _build_energy_equations():
+    return [
         EquationDefinition(
             name="Gravitational Potential Energy (E_p = m*g*h)",
             variables={
@@ -203,10 +510,10 @@ TOPIC_LIBRARY = {
                 "h": "Height (m)",
             },
             solve_rules={
-                "E_p": make_rule(["m", "g", "h"], lambda x: x["m"] * x["g"] * x["h"]),
-                "m": make_rule(["E_p", "g", "h"], lambda x: x["E_p"] / (x["g"] * x["h"])),
-                "g": make_rule(["E_p", "m", "h"], lambda x: x["E_p"] / (x["m"] * x["h"])),
-                "h": make_rule(["E_p", "m", "g"], lambda x: x["E_p"] / (x["m"] * x["g"])),
+                "E_p": make_rule(["m", "g", "h"], lambda m, g, h: m * g * h),
+                "m": make_rule(["E_p", "g", "h"], lambda E_p, g, h: E_p / (g * h)),
+                "g": make_rule(["E_p", "m", "h"], lambda E_p, m, h: E_p / (m * h)),
+                "h": make_rule(["E_p", "m", "g"], lambda E_p, m, g: E_p / (m * g)),
             },
         ),
         EquationDefinition(
@@ -217,9 +524,9 @@ TOPIC_LIBRARY = {
                 "v": "Speed (m/s)",
             },
             solve_rules={
-                "E_k": make_rule(["m", "v"], lambda x: 0.5 * x["m"] * (x["v"] ** 2)),
-                "m": make_rule(["E_k", "v"], lambda x: (2 * x["E_k"]) / (x["v"] ** 2)),
-                "v": make_rule(["E_k", "m"], lambda x: sqrt_checked((2 * x["E_k"]) / x["m"], "v")),
+                "E_k": make_rule(["m", "v"], lambda m, v: 0.5 * m * (v ** 2)),
+                "m": make_rule(["E_k", "v"], lambda E_k, v: (2 * E_k) / (v ** 2)),
+                "v": make_rule(["E_k", "m"], lambda E_k, m: sqrt_checked((2 * E_k) / m, "v")),
             },
         ),
         EquationDefinition(
@@ -230,9 +537,9 @@ TOPIC_LIBRARY = {
                 "d": "Distance moved in direction of force (m)",
             },
             solve_rules={
-                "W": make_rule(["F", "d"], lambda x: x["F"] * x["d"]),
-                "F": make_rule(["W", "d"], lambda x: x["W"] / x["d"]),
-                "d": make_rule(["W", "F"], lambda x: x["W"] / x["F"]),
+                "W": make_rule(["F", "d"], lambda F, d: F * d),
+                "F": make_rule(["W", "d"], lambda W, d: W / d),
+                "d": make_rule(["W", "F"], lambda W, F: W / F),
             },
         ),
         EquationDefinition(
@@ -244,14 +551,17 @@ TOPIC_LIBRARY = {
                 "h": "Vertical height gained (m)",
             },
             solve_rules={
-                "W": make_rule(["m", "g", "h"], lambda x: x["m"] * x["g"] * x["h"]),
-                "m": make_rule(["W", "g", "h"], lambda x: x["W"] / (x["g"] * x["h"])),
-                "g": make_rule(["W", "m", "h"], lambda x: x["W"] / (x["m"] * x["h"])),
-                "h": make_rule(["W", "m", "g"], lambda x: x["W"] / (x["m"] * x["g"])),
+                "W": make_rule(["m", "g", "h"], lambda m, g, h: m * g * h),
+                "m": make_rule(["W", "g", "h"], lambda W, g, h: W / (g * h)),
+                "g": make_rule(["W", "m", "h"], lambda W, m, h: W / (m * h)),
+                "h": make_rule(["W", "m", "g"], lambda W, m, g: W / (m * g)),
             },
         ),
-    ],
-    "Gas Laws and Pressure": [
+    ]
+
+
+def _build_gas_law_equations():
+    return [
         EquationDefinition(
             name="Pressure in a Liquid (P = rho*g*h)",
             variables={
@@ -261,10 +571,10 @@ TOPIC_LIBRARY = {
                 "h": "Depth below surface (m)",
             },
             solve_rules={
-                "P": make_rule(["rho", "g", "h"], lambda x: x["rho"] * x["g"] * x["h"]),
-                "rho": make_rule(["P", "g", "h"], lambda x: x["P"] / (x["g"] * x["h"])),
-                "g": make_rule(["P", "rho", "h"], lambda x: x["P"] / (x["rho"] * x["h"])),
-                "h": make_rule(["P", "rho", "g"], lambda x: x["P"] / (x["rho"] * x["g"])),
+                "P": make_rule(["rho", "g", "h"], lambda rho, g, h: rho * g * h),
+                "rho": make_rule(["P", "g", "h"], lambda P, g, h: P / (g * h)),
+                "g": make_rule(["P", "rho", "h"], lambda P, rho, h: P / (rho * h)),
+                "h": make_rule(["P", "rho", "g"], lambda P, rho, g: P / (rho * g)),
             },
         ),
         EquationDefinition(
@@ -276,10 +586,10 @@ TOPIC_LIBRARY = {
                 "V2": "Final volume (m^3)",
             },
             solve_rules={
-                "P1": make_rule(["V1", "P2", "V2"], lambda x: (x["P2"] * x["V2"]) / x["V1"]),
-                "V1": make_rule(["P1", "P2", "V2"], lambda x: (x["P2"] * x["V2"]) / x["P1"]),
-                "P2": make_rule(["P1", "V1", "V2"], lambda x: (x["P1"] * x["V1"]) / x["V2"]),
-                "V2": make_rule(["P1", "V1", "P2"], lambda x: (x["P1"] * x["V1"]) / x["P2"]),
+                "P1": make_rule(["V1", "P2", "V2"], lambda V1, P2, V2: (P2 * V2) / V1),
+                "V1": make_rule(["P1", "P2", "V2"], lambda P1, P2, V2: (P2 * V2) / P1),
+                "P2": make_rule(["P1", "V1", "V2"], lambda P1, V1, V2: (P1 * V1) / V2),
+                "V2": make_rule(["P1", "V1", "P2"], lambda P1, V1, P2: (P1 * V1) / P2),
             },
         ),
         EquationDefinition(
@@ -291,10 +601,10 @@ TOPIC_LIBRARY = {
                 "T2": "Final absolute temperature (K)",
             },
             solve_rules={
-                "V1": make_rule(["T1", "V2", "T2"], lambda x: (x["V2"] * x["T1"]) / x["T2"]),
-                "T1": make_rule(["V1", "V2", "T2"], lambda x: (x["V1"] * x["T2"]) / x["V2"]),
-                "V2": make_rule(["V1", "T1", "T2"], lambda x: (x["V1"] * x["T2"]) / x["T1"]),
-                "T2": make_rule(["V1", "T1", "V2"], lambda x: (x["V2"] * x["T1"]) / x["V1"]),
+                "V1": make_rule(["T1", "V2", "T2"], lambda T1, V2, T2: (V2 * T1) / T2),
+                "T1": make_rule(["V1", "V2", "T2"], lambda V1, V2, T2: (V1 * T2) / V2),
+                "V2": make_rule(["V1", "T1", "T2"], lambda V1, T1, T2: (V1 * T2) / T1),
+                "T2": make_rule(["V1", "T1", "V2"], lambda V1, T1, V2: (V2 * T1) / V1),
             },
         ),
         EquationDefinition(
@@ -306,14 +616,17 @@ TOPIC_LIBRARY = {
                 "T2": "Final absolute temperature (K)",
             },
             solve_rules={
-                "P1": make_rule(["T1", "P2", "T2"], lambda x: (x["P2"] * x["T1"]) / x["T2"]),
-                "T1": make_rule(["P1", "P2", "T2"], lambda x: (x["P1"] * x["T2"]) / x["P2"]),
-                "P2": make_rule(["P1", "T1", "T2"], lambda x: (x["P1"] * x["T2"]) / x["T1"]),
-                "T2": make_rule(["P1", "T1", "P2"], lambda x: (x["P2"] * x["T1"]) / x["P1"]),
+                "P1": make_rule(["T1", "P2", "T2"], lambda T1, P2, T2: (P2 * T1) / T2),
+                "T1": make_rule(["P1", "P2", "T2"], lambda P1, P2, T2: (P1 * T2) / P2),
+                "P2": make_rule(["P1", "T1", "T2"], lambda P1, T1, T2: (P1 * T2) / T1),
+                "T2": make_rule(["P1", "T1", "P2"], lambda P1, T1, P2: (P2 * T1) / P1),
             },
         ),
-    ],
-    "Refarction": [
+    ]
+
+
+def _build_refraction_equations():
+    return [
         EquationDefinition(
             name="Snell's Law (n1*sin(theta1) = n2*sin(theta2))",
             variables={
@@ -323,14 +636,17 @@ TOPIC_LIBRARY = {
                 "theta2": "Angle of refraction (degrees)",
             },
             solve_rules={
-                "n1": make_rule(["theta1", "n2", "theta2"], lambda x: (x["n2"] * sin_deg(x["theta2"])) / sin_deg(x["theta1"])),
-                "theta1": make_rule(["n1", "n2", "theta2"], lambda x: asin_deg((x["n2"] * sin_deg(x["theta2"])) / x["n1"])),
-                "n2": make_rule(["n1", "theta1", "theta2"], lambda x: (x["n1"] * sin_deg(x["theta1"])) / sin_deg(x["theta2"])),
-                "theta2": make_rule(["n1", "theta1", "n2"], lambda x: asin_deg((x["n1"] * sin_deg(x["theta1"])) / x["n2"])),
+                "n1": make_rule(["theta1", "n2", "theta2"], lambda theta1, n2, theta2: (n2 * sin_deg(theta2)) / sin_deg(theta1)),
+                "theta1": make_rule(["n1", "n2", "theta2"], lambda n1, n2, theta2: asin_deg((n2 * sin_deg(theta2)) / n1)),
+                "n2": make_rule(["n1", "theta1", "theta2"], lambda n1, theta1, theta2: (n1 * sin_deg(theta1)) / sin_deg(theta2)),
+                "theta2": make_rule(["n1", "theta1", "n2"], lambda n1, theta1, n2: asin_deg((n1 * sin_deg(theta1)) / n2)),
             },
         ),
-    ],
-    "Thermal Physics": [
+    ]
+
+
+def _build_thermal_equations():
+    return [
         EquationDefinition(
             name="Heat Capacity (C = Q/delta_T)",
             variables={
@@ -339,9 +655,9 @@ TOPIC_LIBRARY = {
                 "delta_T": "Temperature change (K or deg C)",
             },
             solve_rules={
-                "C": make_rule(["Q", "delta_T"], lambda x: x["Q"] / x["delta_T"]),
-                "Q": make_rule(["C", "delta_T"], lambda x: x["C"] * x["delta_T"]),
-                "delta_T": make_rule(["Q", "C"], lambda x: x["Q"] / x["C"]),
+                "C": make_rule(["Q", "delta_T"], lambda Q, delta_T: Q / delta_T),
+                "Q": make_rule(["C", "delta_T"], lambda C, delta_T: C * delta_T),
+                "delta_T": make_rule(["Q", "C"], lambda Q, C: Q / C),
             },
         ),
         EquationDefinition(
@@ -353,10 +669,10 @@ TOPIC_LIBRARY = {
                 "delta_T": "Temperature change (K or deg C)",
             },
             solve_rules={
-                "c": make_rule(["Q", "m", "delta_T"], lambda x: x["Q"] / (x["m"] * x["delta_T"])),
-                "Q": make_rule(["c", "m", "delta_T"], lambda x: x["c"] * x["m"] * x["delta_T"]),
-                "m": make_rule(["c", "Q", "delta_T"], lambda x: x["Q"] / (x["c"] * x["delta_T"])),
-                "delta_T": make_rule(["c", "Q", "m"], lambda x: x["Q"] / (x["c"] * x["m"])),
+                "c": make_rule(["Q", "m", "delta_T"], lambda Q, m, delta_T: Q / (m * delta_T)),
+                "Q": make_rule(["c", "m", "delta_T"], lambda c, m, delta_T: c * m * delta_T),
+                "m": make_rule(["c", "Q", "delta_T"], lambda c, Q, delta_T: Q / (c * delta_T)),
+                "delta_T": make_rule(["c", "Q", "m"], lambda c, Q, m: Q / (c * m)),
             },
         ),
         EquationDefinition(
@@ -367,9 +683,9 @@ TOPIC_LIBRARY = {
                 "L_f": "Specific latent heat of fusion (J/kg)",
             },
             solve_rules={
-                "Q": make_rule(["m", "L_f"], lambda x: x["m"] * x["L_f"]),
-                "m": make_rule(["Q", "L_f"], lambda x: x["Q"] / x["L_f"]),
-                "L_f": make_rule(["Q", "m"], lambda x: x["Q"] / x["m"]),
+                "Q": make_rule(["m", "L_f"], lambda m, L_f: m * L_f),
+                "m": make_rule(["Q", "L_f"], lambda Q, L_f: Q / L_f),
+                "L_f": make_rule(["Q", "m"], lambda Q, m: Q / m),
             },
         ),
         EquationDefinition(
@@ -380,13 +696,16 @@ TOPIC_LIBRARY = {
                 "L_v": "Specific latent heat of vaporization (J/kg)",
             },
             solve_rules={
-                "Q": make_rule(["m", "L_v"], lambda x: x["m"] * x["L_v"]),
-                "m": make_rule(["Q", "L_v"], lambda x: x["Q"] / x["L_v"]),
-                "L_v": make_rule(["Q", "m"], lambda x: x["Q"] / x["m"]),
+                "Q": make_rule(["m", "L_v"], lambda m, L_v: m * L_v),
+                "m": make_rule(["Q", "L_v"], lambda Q, L_v: Q / L_v),
+                "L_v": make_rule(["Q", "m"], lambda Q, m: Q / m),
             },
         ),
-    ],
-    "Electricity": [
+    ]
+
+
+def _build_electricity_equations():
+    return [
         EquationDefinition(
             name="Current (I = Q/t)",
             variables={
@@ -395,9 +714,9 @@ TOPIC_LIBRARY = {
                 "t": "Time (s)",
             },
             solve_rules={
-                "I": make_rule(["Q", "t"], lambda x: x["Q"] / x["t"]),
-                "Q": make_rule(["I", "t"], lambda x: x["I"] * x["t"]),
-                "t": make_rule(["I", "Q"], lambda x: x["Q"] / x["I"]),
+                "I": make_rule(["Q", "t"], lambda Q, t: Q / t),
+                "Q": make_rule(["I", "t"], lambda I, t: I * t),
+                "t": make_rule(["I", "Q"], lambda I, Q: Q / I),
             },
         ),
         EquationDefinition(
@@ -408,9 +727,9 @@ TOPIC_LIBRARY = {
                 "Q": "Charge (C)",
             },
             solve_rules={
-                "V": make_rule(["E", "Q"], lambda x: x["E"] / x["Q"]),
-                "E": make_rule(["V", "Q"], lambda x: x["V"] * x["Q"]),
-                "Q": make_rule(["V", "E"], lambda x: x["E"] / x["V"]),
+                "V": make_rule(["E", "Q"], lambda E, Q: E / Q),
+                "E": make_rule(["V", "Q"], lambda V, Q: V * Q),
+                "Q": make_rule(["V", "E"], lambda V, E: E / V),
             },
         ),
         EquationDefinition(
@@ -421,9 +740,9 @@ TOPIC_LIBRARY = {
                 "R": "Resistance (ohms)",
             },
             solve_rules={
-                "V": make_rule(["I", "R"], lambda x: x["I"] * x["R"]),
-                "I": make_rule(["V", "R"], lambda x: x["V"] / x["R"]),
-                "R": make_rule(["V", "I"], lambda x: x["V"] / x["I"]),
+                "V": make_rule(["I", "R"], lambda I, R: I * R),
+                "I": make_rule(["V", "R"], lambda V, R: V / R),
+                "R": make_rule(["V", "I"], lambda V, I: V / I),
             },
         ),
         EquationDefinition(
@@ -435,14 +754,17 @@ TOPIC_LIBRARY = {
                 "A": "Cross-sectional area (m^2)",
             },
             solve_rules={
-                "R": make_rule(["rho", "L", "A"], lambda x: (x["rho"] * x["L"]) / x["A"]),
-                "rho": make_rule(["R", "L", "A"], lambda x: (x["R"] * x["A"]) / x["L"]),
-                "L": make_rule(["R", "rho", "A"], lambda x: (x["R"] * x["A"]) / x["rho"]),
-                "A": make_rule(["R", "rho", "L"], lambda x: (x["rho"] * x["L"]) / x["R"]),
+                "R": make_rule(["rho", "L", "A"], lambda rho, L, A: (rho * L) / A),
+                "rho": make_rule(["R", "L", "A"], lambda R, L, A: (R * A) / L),
+                "L": make_rule(["R", "rho", "A"], lambda R, rho, A: (R * A) / rho),
+                "A": make_rule(["R", "rho", "L"], lambda R, rho, L: (rho * L) / R),
             },
         ),
-    ],
-    "Transformers": [
+    ]
+
+
+def _build_transformer_equations():
+    return [
         EquationDefinition(
             name="Transformer Ratio (Vp/Vs = Np/Ns)",
             variables={
@@ -452,10 +774,10 @@ TOPIC_LIBRARY = {
                 "Ns": "Secondary turns",
             },
             solve_rules={
-                "Vp": make_rule(["Vs", "Np", "Ns"], lambda x: (x["Vs"] * x["Np"]) / x["Ns"]),
-                "Vs": make_rule(["Vp", "Np", "Ns"], lambda x: (x["Vp"] * x["Ns"]) / x["Np"]),
-                "Np": make_rule(["Vp", "Vs", "Ns"], lambda x: (x["Vp"] * x["Ns"]) / x["Vs"]),
-                "Ns": make_rule(["Vp", "Vs", "Np"], lambda x: (x["Vs"] * x["Np"]) / x["Vp"]),
+                "Vp": make_rule(["Vs", "Np", "Ns"], lambda Vs, Np, Ns: (Vs * Np) / Ns),
+                "Vs": make_rule(["Vp", "Np", "Ns"], lambda Vp, Np, Ns: (Vp * Ns) / Np),
+                "Np": make_rule(["Vp", "Vs", "Ns"], lambda Vp, Vs, Ns: (Vp * Ns) / Vs),
+                "Ns": make_rule(["Vp", "Vs", "Np"], lambda Vp, Vs, Np: (Vs * Np) / Vp),
             },
         ),
         EquationDefinition(
@@ -467,15 +789,213 @@ TOPIC_LIBRARY = {
                 "Is": "Secondary current (A)",
             },
             solve_rules={
-                "Vp": make_rule(["Ip", "Vs", "Is"], lambda x: (x["Vs"] * x["Is"]) / x["Ip"]),
-                "Ip": make_rule(["Vp", "Vs", "Is"], lambda x: (x["Vs"] * x["Is"]) / x["Vp"]),
-                "Vs": make_rule(["Vp", "Ip", "Is"], lambda x: (x["Vp"] * x["Ip"]) / x["Is"]),
-                "Is": make_rule(["Vp", "Ip", "Vs"], lambda x: (x["Vp"] * x["Ip"]) / x["Vs"]),
+                "Vp": make_rule(["Ip", "Vs", "Is"], lambda Ip, Vs, Is: (Vs * Is) / Ip),
+                "Ip": make_rule(["Vp", "Vs", "Is"], lambda Vp, Vs, Is: (Vs * Is) / Vp),
+                "Vs": make_rule(["Vp", "Ip", "Is"], lambda Vp, Ip, Is: (Vp * Ip) / Is),
+                "Is": make_rule(["Vp", "Ip", "Vs"], lambda Vp, Ip, Vs: (Vp * Ip) / Vs),
             },
         ),
-    ],
+    ]
+
+
+# looottts of topics, each one is only built (and its rules compiled) the first time it is used
+TOPIC_LIBRARY = TopicLibrary(
+    {
+        "Motion of a moving object": _build_motion_equations,
+        "Hookes Law and Moments": _build_hookes_law_equations,
+        "Energy and Work": _build_energy_equations,
+        "Gas Laws and Pressure": _build_gas_law_equations,
+        "Refarction": _build_refraction_equations,
+        "Thermal Physics": _build_thermal_equations,
+        "Electricity": _build_electricity_equations,
+        "Transformers": _build_transformer_equations,
+    }
+)
+
+
+# equations can also come from a JSON file instead of being written out above:
+#
+# {"topics": {"Momentum": [{"name": "Momentum (p = m*v)",
+#                           "variables": {"p": "Momentum (kg m/s)", "m": "Mass (kg)", "v": "Velocity (m/s)"},
+#                           "formulas": {"p": "m * v", "m": "p / v", "v": "p / m"}}]}}
+#
+# a formula is a plain arithmetic expression over the other variables and the functions
+# below. sqrt() is checked the same way as sqrt_checked. compiled formulas are cached next
+# to the file (in __pycache__), keyed by the file's hash, so later runs skip parsing.
+FORMULA_FUNCTIONS = {
+    "sqrt": sqrt_checked,
+    "sin_deg": sin_deg,
+    "asin_deg": asin_deg,
+    "abs": abs,
+    "exp": math.exp,
+    "log": math.log,
+    "log10": math.log10,
+}
+
+_FORMULA_NODES = {
+    "Expression", "BinOp", "UnaryOp", "Constant", "Name", "Call", "Load",
+    "Add", "Sub", "Mult", "Div", "Pow", "USub", "UAdd",
 }
 
+EQUATION_CACHE_VERSION = 2
+
+_LOADED_EQUATION_FILES = []
+
+
+def compile_formula(equation_name, variables, target, expression):
+    import ast
+
+    def fail(reason):
+        raise ValueError(f"Bad formula for {target} in {equation_name!r}: {reason}")
+
+    try:
+        tree = ast.parse(expression, mode="eval")
+    except SyntaxError as error:
+        fail(error.msg)
+
+    used = set()
+    for node in ast.walk(tree):
+        if type(node).__name__ not in _FORMULA_NODES:
+            fail(f"{type(node).__name__} is not allowed")
+        if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float)):
+            fail(f"constant {node.value!r} is not a number")
+        if isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in FORMULA_FUNCTIONS or node.keywords:
+                fail("only calls to " + ", ".join(FORMULA_FUNCTIONS) + " are allowed")
+            if node.func.id == "sqrt":
+                node.args.append(ast.Constant(value=target))
+        elif isinstance(node, ast.Name) and node.id not in FORMULA_FUNCTIONS:
+            if node.id not in variables:
+                fail(f"unknown variable {node.id}")
+            if node.id == target:
+                fail("a formula can't use the variable it solves for")
+            used.add(node.id)
+
+    requires = [variable for variable in variables if variable in used]
+    names = {variable: f"_arg{index}" for index, variable in enumerate(requires)}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and node.id in names:
+            node.id = names[node.id]
+
+    kernel_def = ast.FunctionDef(
+        name="_kernel",
+        args=_kernel_arguments(names.values()),
+        body=[ast.Return(value=tree.body)],
+        decorator_list=[],
+        returns=None,
+    )
+    filename = f"<{equation_name}: {target}>"
+    module = ast.fix_missing_locations(ast.Module(body=[kernel_def], type_ignores=[]))
+    code = compile(module, filename, "exec")
+    # masking rewrites kernel_def in place, so it has to come after the plain kernel is compiled
+    masked_code = _masked_kernel_factory_code(kernel_def, sorted(MASKED_FORMULA_FUNCTIONS), filename)
+    return requires, code, masked_code
+
+
+# specs: [(name, variables, [(target, requires, code, masked_code), ...]), ...]
+def _build_declared_equations(specs):
+    equations = []
+    for name, variables, rule_specs in specs:
+        solve_rules = {}
+        for target, requires, code, masked_code in rule_specs:
+            namespace = {}
+            exec(code, dict(FORMULA_FUNCTIONS), namespace)
+            kernel = namespace["_kernel"]
+            solve_rules[target] = make_rule(requires, kernel)
+            if masked_code is not None:
+                solve_rules[target]["masked_kernel"] = _make_masked_kernel(
+                    masked_code, dict(FORMULA_FUNCTIONS), MASKED_FORMULA_FUNCTIONS
+                )
+        equations.append(EquationDefinition(name=name, variables=variables, solve_rules=solve_rules))
+    return equations
+
+
+def _compile_equation_file(raw_bytes):
+    import json
+
+    try:
+        return _compile_equation_document(json.loads(raw_bytes))
+    except (KeyError, TypeError, AttributeError) as error:
+        raise ValueError(f"Equation file is not in the expected format ({type(error).__name__}: {error})") from None
+
+
+def _compile_equation_document(document):
+    topics = []
+    for topic_name, equation_specs in document["topics"].items():
+        compiled = []
+        for spec in equation_specs:
+            variables = dict(spec["variables"])
+            rule_specs = []
+            for target, expression in spec["formulas"].items():
+                if target not in variables:
+                    raise ValueError(f"{spec['name']!r} has a formula for unknown variable {target}")
+                requires, code, masked_code = compile_formula(spec["name"], variables, target, expression)
+                rule_specs.append((target, requires, code, masked_code))
+            compiled.append((spec["name"], variables, rule_specs))
+        topics.append((topic_name, compiled))
+    return topics
+
+
+def _equation_cache_path(path, digest):
+    directory, filename = os.path.split(os.path.abspath(path))
+    cache_name = f"{filename}.{digest[:16]}.{sys.implementation.cache_tag}.eqc"
+    return os.path.join(directory, "__pycache__", cache_name)
+
+
+def _read_equation_cache(cache_path):
+    try:
+        with open(cache_path, "rb") as cache_file:
+            version, topics = marshal.load(cache_file)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    return topics if version == EQUATION_CACHE_VERSION else None
+
+
+def _write_equation_cache(cache_path, topics):
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        temporary_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(temporary_path, "wb") as cache_file:
+            marshal.dump((EQUATION_CACHE_VERSION, topics), cache_file)
+        os.replace(temporary_path, cache_path)
+    except OSError:
+        # a read-only directory just means no cache, not a failed load
+        pass
+
+
+# loading a file whose contents are already in the library (the same path twice, or a
+# copy of it) does nothing, so its equations aren't added a second time
+def load_equation_file(path, library=None, use_cache=True):
+    import functools
+    import hashlib
+
+    library = TOPIC_LIBRARY if library is None else library
+    with open(path, "rb") as equation_file:
+        raw_bytes = equation_file.read()
+
+    digest = hashlib.sha256(raw_bytes).hexdigest()
+    if digest in library.loaded_files:
+        return list(library.loaded_files[digest])
+    cache_path = _equation_cache_path(path, digest)
+    topics = _read_equation_cache(cache_path) if use_cache else None
+    if topics is None:
+        topics = _compile_equation_file(raw_bytes)
+        if use_cache:
+            _write_equation_cache(cache_path, topics)
+
+    for topic_name, specs in topics:
+        library.extend_topic(topic_name, functools.partial(_build_declared_equations, specs))
+    library.loaded_files[digest] = [topic_name for topic_name, _ in topics]
+    if library is TOPIC_LIBRARY:
+        _LOADED_EQUATION_FILES.append(os.path.abspath(path))
+    return list(library.loaded_files[digest])
+
+
+# pool initializer, so worker processes see the same extra equations as the parent
+def _load_equation_files(paths):
+    for path in paths:
+        load_equation_file(path)
+
 
 def choose_single_option(prompt, options):
     while True:
@@ -497,6 +1017,29 @@ def choose_single_option(prompt, options):
         print("Invalid selection. Please enter a listed number.")
 
 
+# the topic menu also takes words to search for, returns (topic index, None) or (None, query)
+def choose_topic_or_search(topic_names):
+    while True:
+        print()
+        for index, topic_name in enumerate(topic_names, start=1):
+            print(f"{index}. {topic_name}")
+
+        raw_choice = input("Choose a topic (number), or type words to search, like solve for v: ").strip()
+        if raw_choice.lower() in {"q", "quit", "exit"}:
+            raise SystemExit("Exiting physics solver.")
+        if raw_choice == "":
+            print("Invalid selection. Please enter a listed number or some words to search for.")
+            continue
+
+        try:
+            selected_index = int(raw_choice) - 1
+        except ValueError:
+            return None, raw_choice
+        if 0 <= selected_index < len(topic_names):
+            return selected_index, None
+        print("Invalid selection. Please enter a listed number or some words to search for.")
+
+
 def ask_yes_no(prompt):
     while True:
         raw_choice = input(f"{prompt} (y/n): ").strip().lower()
@@ -521,22 +1064,33 @@ def read_known_values(equation):
     print("Enter known values.")
     print("Leave one variable blank so the solver can find it.")
 
+    # imported here so the core doesn't load the unit tables unless they are used
+    from solver_units import parse_quantity, variable_conversion
+
     for variable, description in equation.variables.items():
         while True:
             raw_value = input(f"{variable} ({description}): ").strip()
             if raw_value == "":
                 break
             try:
-                known_values[variable] = float(raw_value)
+                value, unit = parse_quantity(raw_value)
+                factor, offset = variable_conversion(equation, variable, unit)
+                known_values[variable] = value * factor + offset
                 break
-            except ValueError:
-                print("Invalid number. Enter a numeric value or leave blank.")
+            except ValueError as error:
+                print(f"Invalid value: {error}")
+                print("Enter a number, optionally with a unit like 36 km/h, or leave blank.")
 
     return known_values
 
-# checks if the user has inputted a correct value
-def solve_missing_variable(equation, known_values):
-    missing_variables = [variable for variable in equation.variables if variable not in known_values]
+def find_solve_rule(equation, known_variables):
+    target, solve_rule = _find_target_rule(equation, known_variables)
+    _check_required_known(solve_rule, known_variables)
+    return target, solve_rule
+
+
+def _find_target_rule(equation, known_variables):
+    missing_variables = [variable for variable in equation.variables if variable not in known_variables]
 
     if len(missing_variables) != 1:
         raise ValueError(
@@ -546,18 +1100,217 @@ def solve_missing_variable(equation, known_values):
 
     target = missing_variables[0]
     solve_rule = equation.solve_rules.get(target)
+    if solve_rule is None:
+        # imported here, only targets without a hand-written inverse need it
+        from solver_numeric import get_numeric_rule
+
+        solve_rule = get_numeric_rule(equation, target)
     if solve_rule is None:
         raise ValueError(f"No solve rule available for {target} in this equation.")
+    return target, solve_rule
 
+
+def _check_required_known(solve_rule, known_variables):
     required_variables = solve_rule["requires"]
-    missing_required = [var for var in required_variables if var not in known_values]
+    missing_required = [var for var in required_variables if var not in known_variables]
     if missing_required:
         missing_list = ", ".join(missing_required)
         raise ValueError(f"Missing required known values: {missing_list}")
 
-    result = solve_rule["formula"](known_values)
+def apply_rule(solve_rule, values):
+    return solve_rule["formula"](values)
+
+# checks if the user has inputted a correct value
+def solve_missing_variable(equation, known_values):
+    if SOLVER_METRICS is not None:
+        return _solve_missing_variable_measured(equation, known_values, SOLVER_METRICS)
+    target, solve_rule = _find_target_rule(equation, known_values)
+    # pulling the arguments out is also the check that every required value is known
+    try:
+        arguments = solve_rule["arguments"](known_values)
+    except KeyError:
+        arguments = None
+    if arguments is None:
+        _check_required_known(solve_rule, known_values)
+    return target, solve_rule["kernel"](*arguments)
+
+
+def _solve_missing_variable_measured(equation, known_values, metrics):
+    target = ""
+    start = time.perf_counter()
+    try:
+        target, solve_rule = find_solve_rule(equation, known_values)
+        formula_start = time.perf_counter()
+        try:
+            result = apply_rule(solve_rule, known_values)
+        finally:
+            metrics.observe("formula", equation.name, target, time.perf_counter() - formula_start)
+    except Exception as error:
+        metrics.count_error(equation.name, target, type(error).__name__)
+        raise
+    finally:
+        metrics.observe("solve", equation.name, target, time.perf_counter() - start)
     return target, result
 
+# same as solve_missing_variable but every known value is a column (list, tuple or array)
+# and the missing variable is solved for every row in one call. columns that aren't a list
+# or tuple are turned into lists of floats first, so a NumPy array raises ZeroDivisionError
+# like a list does instead of giving inf and a RuntimeWarning
+def _required_columns(solve_rule, columns):
+    required_variables = solve_rule["requires"]
+    required_columns = [columns[variable] for variable in required_variables]
+
+    row_count = len(required_columns[0]) if required_columns else 0
+    for variable, column in zip(required_variables, required_columns):
+        if len(column) != row_count:
+            raise ValueError(f"Column {variable} has {len(column)} rows, expected {row_count}.")
+    return [
+        column if isinstance(column, (list, tuple)) else list(map(float, column)) for column in required_columns
+    ]
+
+
+def solve_batch(equation, columns):
+    target, solve_rule = find_solve_rule(equation, columns)
+    required_columns = _required_columns(solve_rule, columns)
+
+    if solve_rule.get("numeric"):
+        from solver_numeric import solve_numeric_batch
+
+        values, converged, _ = solve_numeric_batch(equation, target, columns)
+        for index, row_converged in enumerate(converged):
+            if not row_converged:
+                raise ValueError(f"Cannot solve {target}: no numeric solution found for row {index}.")
+        return target, values
+
+    if not required_columns:
+        return target, []
+    return target, list(map(solve_rule["kernel"], *required_columns))
+
+# opt-in metrics for the scalar solve path, set by solver_metrics.enable_metrics. while
+# SOLVER_METRICS is None (the default) solve_missing_variable only pays for that one check.
+SOLVER_METRICS = None
+
+
+# like solve_batch, but a bad row doesn't raise: its value is nan and its entry in the
+# returned codes list is one of the ERROR_* codes (ERROR_NONE for rows that solved).
+# only problems with the call itself, like the wrong number of blank columns, still raise.
+def solve_batch_masked(equation, columns):
+    target, solve_rule = find_solve_rule(equation, columns)
+    required_columns = _required_columns(solve_rule, columns)
+
+    if solve_rule.get("numeric"):
+        from solver_numeric import solve_numeric_batch
+
+        values, converged, _ = solve_numeric_batch(equation, target, columns)
+        return target, values, [ERROR_NONE if ok else ERROR_NO_NUMERIC_SOLUTION for ok in converged]
+
+    masked = get_masked_kernel(solve_rule)
+    row_count = len(required_columns[0]) if required_columns else 0
+    _take_masked_code()
+    try:
+        values = list(map(masked, *required_columns)) if required_columns else []
+    except (ArithmeticError, ValueError):
+        # something the masked kernel doesn't cover, like a float overflow; redo row by row
+        masked = _catching_kernel(solve_rule)
+        values = list(map(masked, *required_columns))
+
+    codes = [ERROR_NONE] * row_count
+    for index, value in enumerate(values):
+        if value != value:
+            # run the bad row again on its own to find out why it failed
+            _take_masked_code()
+            masked(*[column[index] for column in required_columns])
+            codes[index] = _take_masked_code() or ERROR_NOT_A_NUMBER
+    return target, values, codes
+
+
+# over-determined rows (every variable known) can't be solved, but they can be checked:
+# predict the anchor variable from the others and compare it with the measured value.
+# relative error is |predicted - measured| / max(|predicted|, |measured|), nan where the
+# prediction failed
+def evaluate_residuals(equation, columns, anchor=None):
+    if anchor is None:
+        variables = list(equation.variables)
+        anchor = next((variable for variable in variables if variable in equation.solve_rules), variables[0])
+    known_columns = {variable: columns[variable] for variable in equation.variables if variable != anchor}
+    _, predicted, codes = solve_batch_masked(equation, known_columns)
+
+    relative_errors = []
+    for measured, value, code in zip(columns[anchor], predicted, codes):
+        scale = max(abs(measured), abs(value))
+        if code != ERROR_NONE or value != value:
+            relative_errors.append(math.nan)
+        elif scale == 0:
+            relative_errors.append(0.0)
+        else:
+            relative_errors.append(abs(value - measured) / scale)
+    return anchor, relative_errors, codes
+
+
+# a row flagged on the first anchor gets another chance on the other anchors, since an
+# inverse can lose information (v = sqrt(u^2 + 2*a*s) never predicts a negative v).
+# only the flagged rows are redone, so consistent data pays for one anchor
+def _checked_residuals(equation, columns, tolerance):
+    anchor, relative_errors, codes = evaluate_residuals(equation, columns)
+    for other_anchor in equation.solve_rules:
+        flagged_rows = [index for index, error in enumerate(relative_errors) if not error <= tolerance]
+        if not flagged_rows:
+            break
+        if other_anchor == anchor:
+            continue
+        flagged_columns = {
+            variable: [columns[variable][index] for index in flagged_rows] for variable in equation.variables
+        }
+        _, other_errors, other_codes = evaluate_residuals(equation, flagged_columns, other_anchor)
+        for index, error, code in zip(flagged_rows, other_errors, other_codes):
+            if error < relative_errors[index] or relative_errors[index] != relative_errors[index]:
+                relative_errors[index] = error
+                codes[index] = code
+    return anchor, relative_errors, codes
+
+
+class ConsistencyReport:
+    def __init__(self, equation, anchor, relative_errors, codes, tolerance):
+        self.equation = equation
+        self.anchor = anchor
+        self.relative_errors = relative_errors
+        self.codes = codes
+        self.tolerance = tolerance
+        # "not <=" so nan errors get flagged too
+        self.flagged_rows = [index for index, error in enumerate(relative_errors) if not error <= tolerance]
+
+
+# checks the columns against every equation (default: the whole library) whose variables
+# all have a column, one report per equation
+def check_dataset_consistency(columns, tolerance=1e-6, equations=None):
+    if equations is None:
+        equations = [equation for topic_name in TOPIC_LIBRARY for equation in TOPIC_LIBRARY[topic_name]]
+    reports = []
+    for equation in equations:
+        if all(variable in columns for variable in equation.variables):
+            anchor, relative_errors, codes = _checked_residuals(equation, columns, tolerance)
+            reports.append(ConsistencyReport(equation, anchor, relative_errors, codes, tolerance))
+    return reports
+
+
+# give topic_name when it's known, so only that topic has to be built
+def find_equation(name, topic_name=None):
+    topic_names = list(TOPIC_LIBRARY) if topic_name is None else [topic_name]
+    equations = [equation for topic in topic_names for equation in TOPIC_LIBRARY[topic]]
+    for equation in equations:
+        if equation.name == name:
+            return equation
+
+    lowered = name.lower()
+    matches = [equation for equation in equations if lowered in equation.name.lower()]
+    if len(matches) == 1:
+        return matches[0]
+    if not matches:
+        raise ValueError(f"No equation matches {name!r}.")
+    match_list = ", ".join(equation.name for equation in matches)
+    raise ValueError(f"{name!r} matches more than one equation: {match_list}")
+
+
 # this simply runs da code
 def run_solver():
     print("=" * 64)
@@ -566,13 +1319,22 @@ def run_solver():
     print("Type q / quit / exit at menu prompts to close the app.")
     print("=" * 64)
 
+    topic_names = list(TOPIC_LIBRARY.keys())
     while True:
-        topic_names = list(TOPIC_LIBRARY.keys())
-        topic_index = choose_single_option("Choose a topic", topic_names)
-        topic_name = topic_names[topic_index]
+        topic_index, query = choose_topic_or_search(topic_names)
+        if query is None:
+            equations = TOPIC_LIBRARY[topic_names[topic_index]]
+            equation_names = [equation.name for equation in equations]
+        else:
+            # imported here so the index is only built once someone searches
+            from solver_search import search_equations
 
-        equations = TOPIC_LIBRARY[topic_name]
-        equation_names = [equation.name for equation in equations]
+            matches = search_equations(query)
+            if not matches:
+                print(f"No equations match {query!r}.")
+                continue
+            equations = [equation for _, _, equation in matches]
+            equation_names = [f"{equation.name} [{topic_name}]" for _, topic_name, equation in matches]
         equation_index = choose_single_option("Choose an equation", equation_names)
         equation = equations[equation_index]
 
@@ -597,5 +1359,11 @@ def run_solver():
 
 
 if __name__ == "__main__":
-    run_solver()
+    # any arguments mean batch mode, which lives in solver_batch
+    if len(sys.argv) > 1:
+        import solver_batch
+
+        solver_batch.main()
+    else:
+        run_solver()
 
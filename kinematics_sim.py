@@ -0,0 +1,181 @@
+import argparse
+import array
+import itertools
+import json
+import mmap
+import operator
+import os
+import random
+import sys
+import time
+
+from Physics_Solver import find_equation
+
+MOTION_TOPIC = "Motion of a moving object"
+
+
+# a rule's kernel, called with one column (or itertools.repeat) per required variable
+def _rule_kernel(equation, target):
+    rule = equation.solve_rules[target]
+    return rule["requires"], rule["kernel"]
+
+
+# N bodies moving with constant acceleration, kept as one array('d') per quantity
+# (struct of arrays) instead of one object per body. u is each body's velocity at
+# self.time, so every step is v = u + a*t and s = u*t + 0.5*a*t^2 from the motion
+# topic, run over all bodies at once. with constant a both are exact, so step size
+# only decides where snapshots can be taken, not how accurate they are.
+class KinematicsSimulation:
+    def __init__(self, s, u, a, start_time=0.0):
+        self.s = array.array("d", s)
+        self.u = array.array("d", u)
+        self.a = array.array("d", a)
+        if not len(self.s) == len(self.u) == len(self.a):
+            raise ValueError("s, u and a must have one value per body.")
+        self.time = float(start_time)
+
+        self.velocity_requires, self.velocity_kernel = _rule_kernel(find_equation("1st Equation", MOTION_TOPIC), "v")
+        self.displacement_requires, self.displacement_kernel = _rule_kernel(
+            find_equation("2nd Equation", MOTION_TOPIC), "s"
+        )
+
+    @property
+    def body_count(self):
+        return len(self.s)
+
+    def _columns(self, dt):
+        return {"u": self.u, "a": self.a, "t": itertools.repeat(dt)}
+
+    def advance(self, dt):
+        if dt == 0:
+            return
+        columns = self._columns(dt)
+        displacement = map(self.displacement_kernel, *[columns[name] for name in self.displacement_requires])
+        self.s = array.array("d", map(operator.add, self.s, displacement))
+        # u is still the velocity at the start of the step here, so this has to come after s
+        columns = self._columns(dt)
+        self.u = array.array("d", map(self.velocity_kernel, *[columns[name] for name in self.velocity_requires]))
+        self.time += dt
+
+    def advance_to(self, event_time):
+        if event_time < self.time:
+            raise ValueError(f"Cannot go back from t = {self.time} to t = {event_time}.")
+        self.advance(event_time - self.time)
+
+    # a new acceleration from now on, for every body or one value per body
+    def set_acceleration(self, a):
+        if isinstance(a, (int, float)):
+            self.a = array.array("d", itertools.repeat(float(a), self.body_count))
+            return
+        a = array.array("d", a)
+        if len(a) != self.body_count:
+            raise ValueError("a must have one value per body.")
+        self.a = a
+
+    # advances through the given times in order and hands every state to writer.write
+    def run(self, event_times, writer=None):
+        for event_time in event_times:
+            self.advance_to(event_time)
+            if writer is not None:
+                writer.write(self)
+
+
+# snapshots go to one raw float64 file, frame after frame: the time, then s for every
+# body, then u for every body. the frame count comes from the file size, so a run that
+# was stopped halfway still leaves a readable file. path + ".json" has the layout.
+class SnapshotWriter:
+    def __init__(self, path, body_count):
+        self.path = path
+        self.body_count = body_count
+        metadata = {"body_count": body_count, "fields": ["s", "u"], "byteorder": sys.byteorder}
+        with open(path + ".json", "w", encoding="utf-8") as metadata_file:
+            json.dump(metadata, metadata_file)
+        self.data_file = open(path, "wb")
+        self.frame_count = 0
+
+    def write(self, simulation):
+        if simulation.body_count != self.body_count:
+            raise ValueError(f"Expected {self.body_count} bodies, got {simulation.body_count}.")
+        array.array("d", [simulation.time]).tofile(self.data_file)
+        simulation.s.tofile(self.data_file)
+        simulation.u.tofile(self.data_file)
+        self.frame_count += 1
+
+    def close(self):
+        self.data_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Trajectory:
+    def __init__(self, path):
+        with open(path + ".json", encoding="utf-8") as metadata_file:
+            self.metadata = json.load(metadata_file)
+        if self.metadata["byteorder"] != sys.byteorder:
+            raise ValueError(f"{path} was written on a {self.metadata['byteorder']}-endian machine.")
+
+        self.body_count = self.metadata["body_count"]
+        self.fields = self.metadata["fields"]
+        self.frame_size = 1 + len(self.fields) * self.body_count
+        self._file = open(path, "rb")
+        size = os.path.getsize(path)
+        self.frame_count = size // (self.frame_size * 8)
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self._values = memoryview(self._map).cast("d") if size else memoryview(array.array("d"))
+
+    def time(self, frame):
+        return self._values[self._frame_start(frame)]
+
+    @property
+    def times(self):
+        return [self.time(frame) for frame in range(self.frame_count)]
+
+    # field ("s" or "u") of every body in one frame, as a float64 memoryview into the file
+    def field(self, frame, name):
+        start = self._frame_start(frame) + 1 + self.fields.index(name) * self.body_count
+        return self._values[start : start + self.body_count]
+
+    def _frame_start(self, frame):
+        if not 0 <= frame < self.frame_count:
+            raise IndexError(f"frame {frame} out of range ({self.frame_count} frames)")
+        return frame * self.frame_size
+
+    def close(self):
+        self._values.release()
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move many bodies with constant acceleration and save snapshots.")
+    parser.add_argument("--bodies", type=int, default=100000, help="number of bodies (default: 100000)")
+    parser.add_argument("--steps", type=int, default=10, help="number of time steps (default: 10)")
+    parser.add_argument("--dt", type=float, default=0.1, help="time step in seconds (default: 0.1)")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the random starting state")
+    parser.add_argument("--output", default="trajectory.bin", help="snapshot file (default: trajectory.bin)")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    simulation = KinematicsSimulation(
+        [rng.uniform(-100, 100) for _ in range(args.bodies)],
+        [rng.uniform(-10, 10) for _ in range(args.bodies)],
+        [rng.uniform(-2, 2) for _ in range(args.bodies)],
+    )
+    start = time.perf_counter()
+    with SnapshotWriter(args.output, args.bodies) as writer:
+        writer.write(simulation)
+        simulation.run((args.dt * step for step in range(1, args.steps + 1)), writer)
+    elapsed = time.perf_counter() - start
+
+    body_steps = args.bodies * args.steps
+    rate = body_steps / elapsed if elapsed > 0 else float("inf")
+    print(f"{args.steps} steps of {args.bodies} bodies in {elapsed:.2f}s ({rate:,.0f} body-steps/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,65 @@
-import random
+import argparse
+import array
+import collections
+import csv
+import functools
+import io
+import itertools
+import json
 import math
+import random
+import sys
+import time
+
+
+# every (a, b, c) the quadratic questions can use, for each a, so picking one is a single
+# random.choice instead of redrawing b and c until the discriminant is positive. each a
+# also has its triples split by the kind of roots they give: "integer" (both roots
+# whole numbers), "rational" and "irrational".
+QUADRATIC_A_RANGE = range(1, 4)
+QUADRATIC_B_RANGE = range(-10, 11)
+QUADRATIC_C_RANGE = range(-10, 11)
+ROOT_KINDS = ["integer", "rational", "irrational"]
+
+
+def quadratic_root_kind(a, b, c):
+    discriminant = b**2 - 4*a*c
+    sqrt_disc = math.isqrt(discriminant)
+    if sqrt_disc * sqrt_disc != discriminant:
+        return "irrational"
+    if (-b - sqrt_disc) % (2 * a) == 0 and (-b + sqrt_disc) % (2 * a) == 0:
+        return "integer"
+    return "rational"
+
+
+def build_quadratic_table():
+    table = {}
+    for a in QUADRATIC_A_RANGE:
+        buckets = {"all": []}
+        buckets.update((kind, []) for kind in ROOT_KINDS)
+        for b in QUADRATIC_B_RANGE:
+            for c in QUADRATIC_C_RANGE:
+                if b**2 - 4*a*c > 0:
+                    buckets["all"].append((a, b, c))
+                    buckets[quadratic_root_kind(a, b, c)].append((a, b, c))
+        table[a] = buckets
+    return table
+
+
+QUADRATIC_TABLE = build_quadratic_table()
+# the a values that have at least one triple of each kind (a = 1 never gives rational roots)
+QUADRATIC_A_VALUES = {
+    bucket: [a for a in QUADRATIC_A_RANGE if QUADRATIC_TABLE[a][bucket]] for bucket in ["all"] + ROOT_KINDS
+}
+
+
+# with root_kind=None this picks exactly like the old rejection loop did: a first, then
+# any (b, c) that works for it, all equally likely
+def draw_quadratic_coefficients(rng, root_kind=None):
+    bucket = "all" if root_kind is None else root_kind
+    a = rng.choice(QUADRATIC_A_VALUES[bucket])
+    return rng.choice(QUADRATIC_TABLE[a][bucket])
+
 
 class Questioning:
     def __init__(self, question):
@@ -78,18 +138,11 @@ class Quiz:
         answering_obj.correct_answer = answer
         return answering_obj
     
-    def generate_quadtratic_question(self):
-        a = random.randint(1, 3)        
-        b = random.randint(-10, 10)        
-        c = random.randint(-10, 10)
+    def generate_quadtratic_question(self, root_kind=None):
+        a, b, c = draw_quadratic_coefficients(random, root_kind)
 
         discriminant = b**2 - 4*a*c
 
-        while discriminant <= 0: 
-               b = random.randint(-10, 10)        
-               c = random.randint(-10, 10)  
-               discriminant = b**2 - 4*a*c  
-
         sqrt_disc = math.sqrt(discriminant)      
         root1 = (-b - sqrt_disc) / (2 * a)      
         root2 = (-b + sqrt_disc) / (2 * a)
@@ -154,6 +207,357 @@ class Quiz:
             print("Thank you for partcipating in my verry first project")
             break
 
+    def generate_question_bank(self, num_questions, seed=None):
+        # same order as run_quiz (log, integral, quadratic, log, ...) but every type's
+        # numbers are drawn for the whole batch at once from one seeded generator
+        rng = random.Random(seed)
+        batch_generators = [draw_logarithmic_batch, draw_integral_batch, draw_quadratic_batch]
+        questions = [None] * num_questions
+        for i, draw_batch in enumerate(batch_generators):
+            questions[i::len(batch_generators)] = draw_batch(rng, len(range(i, num_questions, len(batch_generators))))
+        return questions
+
+
+# batch versions of the three generators above, same ranges and same questions, but
+# rng.choices draws all the numbers for count questions in one call. the draw_*_rows
+# functions give plain (question, answer, second root or None) tuples, the draw_*_batch
+# ones the same questions as Questioning objects
+def draw_logarithmic_rows(rng, count):
+    return [(f'Solve log10(x)={y} for x', 10 ** y, None) for y in rng.choices(range(1, 6), k=count)]
+
+
+# there are only a few thousand different integral and quadratic questions, so each one
+# is worked out and formatted once and looked up after that
+@functools.lru_cache(maxsize=None)
+def integral_row(a, b, c, lower_bound, upper_bound):
+    upper = (a/3) * (upper_bound**3) + (b/2) * (upper_bound**2) + c * upper_bound
+    lower = (a/3) * (lower_bound**3) + (b/2) * (lower_bound**2) + c * lower_bound
+    question = f'Find ∫({a}x^2 + {b}x + {c}) dx from {lower_bound} to {upper_bound}'
+    return question, round(upper - lower, 4), None
+
+
+@functools.lru_cache(maxsize=None)
+def quadratic_row(a, b, c):
+    sqrt_disc = math.sqrt(b**2 - 4*a*c)
+    root1 = (-b - sqrt_disc) / (2 * a)
+    root2 = (-b + sqrt_disc) / (2 * a)
+
+    if root1 > root2:
+        root1, root2 = root2, root1
+        root1 = round(root1, 4)
+        root2 = round(root2, 4)
+
+    return f"Solve for x: {a}x^2 + {b}x + {c} = 0", root1, root2
+
+
+def draw_integral_rows(rng, count):
+    a_values = rng.choices(range(1, 6), k=count)
+    b_values = rng.choices(range(-3, 4), k=count)
+    c_values = rng.choices(range(-5, 6), k=count)
+    lower_bounds = rng.choices(range(0, 3), k=count)
+    # randint(lower_bound + 1, 5) for every question
+    upper_bounds = [lower_bound + 1 + int(rng.random() * (5 - lower_bound)) for lower_bound in lower_bounds]
+
+    return list(map(integral_row, a_values, b_values, c_values, lower_bounds, upper_bounds))
+
+
+def draw_quadratic_rows(rng, count, root_kind=None):
+    bucket = "all" if root_kind is None else root_kind
+    a_values = rng.choices(QUADRATIC_A_VALUES[bucket], k=count)
+    return [quadratic_row(*rng.choice(QUADRATIC_TABLE[a][bucket])) for a in a_values]
+
+
+def draw_logarithmic_batch(rng, count):
+    questions = []
+    for question, answer, _ in draw_logarithmic_rows(rng, count):
+        question_obj = Questioning(question)
+        question_obj.correct_answer = answer
+        questions.append(question_obj)
+    return questions
+
+
+def draw_integral_batch(rng, count):
+    questions = []
+    for question, answer, _ in draw_integral_rows(rng, count):
+        answering_obj = Questioning(question)
+        answering_obj.correct_answer = answer
+        questions.append(answering_obj)
+    return questions
+
+
+def draw_quadratic_batch(rng, count, root_kind=None):
+    questions = []
+    for question, root1, root2 in draw_quadratic_rows(rng, count, root_kind):
+        questioning_obj = Questioning(question)
+        questioning_obj.root1 = root1
+        questioning_obj.root2 = root2
+        questions.append(questioning_obj)
+    return questions
+
+
+# non-interactive export: questions are made in shards of shard_size, each shard with its
+# own generator seeded from f"{seed}:{shard}", so shard k comes out the same whichever
+# process makes it. shards are written in order, with at most workers * 2 of them in
+# flight, so memory stays flat however many questions are asked for. the output depends
+# on count, seed and shard_size only, not on the number of workers.
+QUESTION_TYPES = ["logarithmic", "integral", "quadratic"]
+QUESTION_ROW_DRAWERS = [draw_logarithmic_rows, draw_integral_rows, draw_quadratic_rows]
+EXPORT_FIELDS = ["id", "type", "question", "answer", "root2"]
+
+
+def generate_shard_rows(seed, shard, start, stop):
+    # same cycle as run_quiz, by overall question number
+    rng = random.Random(f"{seed}:{shard}")
+    rows = [None] * (stop - start)
+    for type_index, draw_rows in enumerate(QUESTION_ROW_DRAWERS):
+        first = start + (type_index - start) % len(QUESTION_ROW_DRAWERS)
+        ids = range(first, stop, len(QUESTION_ROW_DRAWERS))
+        question_type = QUESTION_TYPES[type_index]
+        for question_id, (question, answer, root2) in zip(ids, draw_rows(rng, len(ids))):
+            rows[question_id - start] = (question_id, question_type, question, answer, root2)
+    return rows
+
+
+# everything after the id, per output format and question
+_FORMATTED_ROW_ENDS = {"jsonl": {}, "csv": {}}
+
+
+def _format_row_end(output_format, row):
+    if output_format == "csv":
+        output = io.StringIO()
+        csv.writer(output, lineterminator="\n").writerow(row)
+        return "," + output.getvalue()
+    # '{"type": ...}' -> ', "type": ...}', so '{"id": 5' + this is json.dumps of the whole row
+    return ", " + json.dumps(dict(zip(EXPORT_FIELDS[1:], row)))[1:] + "\n"
+
+
+def format_shard(seed, shard, start, stop, output_format):
+    row_ends = _FORMATTED_ROW_ENDS[output_format]
+    line_start = '{"id": ' if output_format == "jsonl" else ""
+    lines = []
+    for question_id, *row in generate_shard_rows(seed, shard, start, stop):
+        row = tuple(row)
+        row_end = row_ends.get(row)
+        if row_end is None:
+            row_end = row_ends[row] = _format_row_end(output_format, row)
+        lines.append(f"{line_start}{question_id}{row_end}")
+    return "".join(lines)
+
+
+def export_questions(output_stream, count, seed="0", output_format="jsonl", workers=1, shard_size=100000):
+    if output_format == "csv":
+        output_stream.write(",".join(EXPORT_FIELDS) + "\n")
+    shards = [
+        (seed, shard, start, min(start + shard_size, count), output_format)
+        for shard, start in enumerate(range(0, count, shard_size))
+    ]
+
+    if workers <= 1:
+        for arguments in shards:
+            output_stream.write(format_shard(*arguments))
+        return count
+
+    # imported here so the interactive quiz doesn't pay for it
+    import concurrent.futures
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = collections.deque()
+        for arguments in shards:
+            pending.append(executor.submit(format_shard, *arguments))
+            if len(pending) >= workers * 2:
+                output_stream.write(pending.popleft().result())
+        while pending:
+            output_stream.write(pending.popleft().result())
+    return count
+
+
+# batch grading against an exported answer key. the key keeps one float answer and one
+# type number per question id in flat arrays, so a 10^7 question key is ~90 MB, not a
+# dict of rows. submissions are graded a chunk at a time: the comparisons are one list
+# comprehension per chunk and the per-student and per-type tallies are Counter.update calls.
+ANSWER_TOLERANCE = 0.01
+SUBMISSION_FIELDS = ["student", "question_id", "answer"]
+
+
+def detect_format(path):
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+
+def iter_rows(stream, input_format):
+    if input_format == "csv":
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def iter_chunks(iterable, chunk_size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+# question ids that aren't a whole number ("x", "", "2.5", None) come back as -1, which
+# no question has
+def to_question_id(value):
+    number = to_float(value)
+    return int(number) if number.is_integer() else -1
+
+
+class AnswerKey:
+    def __init__(self):
+        self.answers = array.array("d")
+        # index into QUESTION_TYPES, -1 for ids that aren't in the key
+        self.type_indexes = array.array("b")
+
+    def add(self, question_id, question_type, answer):
+        if question_id >= len(self.answers):
+            missing = question_id + 1 - len(self.answers)
+            self.answers.extend(itertools.repeat(math.nan, missing))
+            self.type_indexes.extend(itertools.repeat(-1, missing))
+        self.answers[question_id] = answer
+        self.type_indexes[question_id] = QUESTION_TYPES.index(question_type)
+
+    def __len__(self):
+        return sum(1 for type_index in self.type_indexes if type_index >= 0)
+
+
+# reads a file written by export_questions. "answer" is already the smaller root for quadratics
+def load_answer_key(path, input_format=None):
+    answer_key = AnswerKey()
+    with open(path, encoding="utf-8", newline="") as key_file:
+        for row in iter_rows(key_file, input_format or detect_format(path)):
+            answer_key.add(int(row["id"]), row["type"], float(row["answer"]))
+    return answer_key
+
+
+class GradeReport:
+    def __init__(self):
+        self.student_correct = collections.Counter()
+        self.student_total = collections.Counter()
+        self.type_correct = collections.Counter()
+        self.type_total = collections.Counter()
+        # submissions for question ids the key doesn't have (or that aren't ids at all),
+        # not counted for or against anyone
+        self.unknown_questions = 0
+
+    def student_scores(self):
+        return {student: (self.student_correct[student], total) for student, total in self.student_total.items()}
+
+    def type_accuracy(self):
+        return {
+            question_type: self.type_correct[question_type] / total for question_type, total in self.type_total.items()
+        }
+
+
+# submissions are (student, question id, answer) tuples. answers that aren't numbers are wrong
+def grade_submissions(answer_key, submissions, chunk_size=65536, report=None):
+    report = GradeReport() if report is None else report
+    answers = answer_key.answers
+    type_indexes = answer_key.type_indexes
+    key_size = len(answers)
+
+    for chunk in iter_chunks(submissions, chunk_size):
+        students, question_ids, submitted = zip(*chunk)
+        question_ids = [to_question_id(question_id) for question_id in question_ids]
+        known = [0 <= question_id < key_size and type_indexes[question_id] >= 0 for question_id in question_ids]
+        if not all(known):
+            report.unknown_questions += known.count(False)
+            students = list(itertools.compress(students, known))
+            question_ids = list(itertools.compress(question_ids, known))
+            submitted = list(itertools.compress(submitted, known))
+
+        question_types = [QUESTION_TYPES[type_indexes[question_id]] for question_id in question_ids]
+        correct = [
+            abs(to_float(answer) - answers[question_id]) < ANSWER_TOLERANCE
+            for answer, question_id in zip(submitted, question_ids)
+        ]
+
+        report.student_total.update(students)
+        report.student_correct.update(itertools.compress(students, correct))
+        report.type_total.update(question_types)
+        report.type_correct.update(itertools.compress(question_types, correct))
+    return report
+
+
+def iter_submissions(stream, input_format):
+    for row in iter_rows(stream, input_format):
+        yield row["student"], row["question_id"], row["answer"]
+
+
+def grade_file(answer_key_path, submissions_path, chunk_size=65536):
+    answer_key = load_answer_key(answer_key_path)
+    with open(submissions_path, encoding="utf-8", newline="") as submissions_file:
+        submissions = iter_submissions(submissions_file, detect_format(submissions_path))
+        return grade_submissions(answer_key, submissions, chunk_size)
+
+
+def write_grade_report(report, output_stream):
+    writer = csv.writer(output_stream, lineterminator="\n")
+    writer.writerow(["student", "correct", "total", "percentage"])
+    for student, (correct, total) in sorted(report.student_scores().items()):
+        writer.writerow([student, correct, total, f"{correct / total * 100:.1f}"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maths quiz. Starts the interactive quiz unless --export is given.")
+    parser.add_argument("--export", help="write questions and answers to this .jsonl or .csv file (- for stdout)")
+    parser.add_argument("--count", type=int, default=1000, help="number of questions to export (default: 1000)")
+    parser.add_argument("--seed", default="0", help="seed for the export, the same seed gives the same file")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="export format (default: from the file extension)")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes making shards (default: 1)")
+    parser.add_argument("--shard-size", type=int, default=100000, help="questions per shard (default: 100000)")
+    parser.add_argument(
+        "--grade", metavar="SUBMISSIONS", help="grade a .csv or .jsonl file of student, question_id, answer rows"
+    )
+    parser.add_argument("--answer-key", help="exported questions to grade --grade against")
+    parser.add_argument("--report", default="-", help="where to write per-student scores as CSV (default: stdout)")
+    args = parser.parse_args()
+
+    if args.grade is not None:
+        if args.answer_key is None:
+            parser.error("--grade needs --answer-key")
+        start = time.perf_counter()
+        report = grade_file(args.answer_key, args.grade)
+        if args.report == "-":
+            write_grade_report(report, sys.stdout)
+        else:
+            with open(args.report, "w", encoding="utf-8", newline="") as report_file:
+                write_grade_report(report, report_file)
+        for question_type, accuracy in sorted(report.type_accuracy().items()):
+            print(f"{question_type}: {accuracy * 100:.1f}% correct", file=sys.stderr)
+        if report.unknown_questions:
+            print(f"{report.unknown_questions} answers were for questions not in the key", file=sys.stderr)
+        print(f"Graded in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+        return
+
+    if args.export is None:
+        quiz = Quiz()
+        quiz.run_quiz()
+        return
+
+    output_format = args.format or detect_format(args.export)
+    start = time.perf_counter()
+    if args.export == "-":
+        export_questions(sys.stdout, args.count, args.seed, output_format, args.workers, args.shard_size)
+    else:
+        with open(args.export, "w", encoding="utf-8", newline="") as output_stream:
+            export_questions(output_stream, args.count, args.seed, output_format, args.workers, args.shard_size)
+    elapsed = time.perf_counter() - start
+    print(f"Exported {args.count} questions in {elapsed:.2f}s", file=sys.stderr)
+
 
-quiz = Quiz()
-quiz.run_quiz()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
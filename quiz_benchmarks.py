@@ -0,0 +1,99 @@
+import argparse
+import collections
+import math
+import random
+import statistics
+import time
+
+from math_quiz import QUADRATIC_TABLE, ROOT_KINDS, Quiz, draw_quadratic_coefficients
+
+
+# the rejection loop generate_quadtratic_question used before QUADRATIC_TABLE
+def draw_quadratic_coefficients_rejection(rng):
+    a = rng.randint(1, 3)
+    b = rng.randint(-10, 10)
+    c = rng.randint(-10, 10)
+    while b**2 - 4*a*c <= 0:
+        b = rng.randint(-10, 10)
+        c = rng.randint(-10, 10)
+    return a, b, c
+
+
+def percentile(sorted_values, percent):
+    index = min(len(sorted_values) - 1, max(0, math.ceil(percent / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+# times every call on its own, so the tail (p99, p99.9, max) is visible and not just the mean.
+# the timer itself costs a few tens of ns per call, the same for both methods
+def time_each_call_ns(function, count):
+    perf_counter_ns = time.perf_counter_ns
+    latencies = []
+    for _ in range(count):
+        start = perf_counter_ns()
+        function()
+        latencies.append(perf_counter_ns() - start)
+    latencies.sort()
+    return latencies
+
+
+def print_latencies(label, latencies):
+    print(
+        f"{label:<24} {statistics.fmean(latencies):>8.0f} {percentile(latencies, 50):>8} "
+        f"{percentile(latencies, 99):>8} {percentile(latencies, 99.9):>8} {latencies[-1]:>9}"
+    )
+
+
+def bench_quadratic(args):
+    print(f"{'ns per question':<24} {'mean':>8} {'p50':>8} {'p99':>8} {'p99.9':>8} {'max':>9}")
+
+    rng = random.Random(args.seed)
+    print_latencies("rejection loop", time_each_call_ns(lambda: draw_quadratic_coefficients_rejection(rng), args.count))
+    rng = random.Random(args.seed)
+    print_latencies("table draw", time_each_call_ns(lambda: draw_quadratic_coefficients(rng), args.count))
+    for kind in ROOT_KINDS:
+        rng = random.Random(args.seed)
+        print_latencies(
+            f"table draw ({kind})", time_each_call_ns(lambda: draw_quadratic_coefficients(rng, kind), args.count)
+        )
+
+    quiz = Quiz()
+    random.seed(args.seed)
+    print_latencies("whole question", time_each_call_ns(quiz.generate_quadtratic_question, args.count))
+
+    # how many times the rejection loop draws b and c, per a
+    print()
+    print(f"{'a':<4} {'valid (b, c)':>13} {'draws per question':>19}")
+    pair_count = len(range(-10, 11)) ** 2
+    for a, buckets in QUADRATIC_TABLE.items():
+        print(f"{a:<4} {len(buckets['all']):>13} {pair_count / len(buckets['all']):>19.2f}")
+
+
+# the two ways should pick every (a, b, c) about equally often
+def bench_distribution(args):
+    rng = random.Random(args.seed)
+    rejection = collections.Counter(draw_quadratic_coefficients_rejection(rng) for _ in range(args.count))
+    rng = random.Random(args.seed)
+    table = collections.Counter(draw_quadratic_coefficients(rng) for _ in range(args.count))
+    triples = set(rejection) | set(table)
+    largest_gap = max(abs(rejection[triple] - table[triple]) / args.count for triple in triples)
+    print(f"{len(triples)} triples, largest difference in frequency: {largest_gap:.5f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for the math quiz question generators.")
+    parser.add_argument("--count", type=int, default=200000)
+    parser.add_argument("--seed", type=int, default=0)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("quadratic", help="per-question latency of the rejection loop vs the table draw")
+    commands.add_parser("distribution", help="compare how often each (a, b, c) comes up")
+
+    args = parser.parse_args()
+    if args.command == "quadratic":
+        bench_quadratic(args)
+    elif args.command == "distribution":
+        bench_distribution(args)
+
+
+if __name__ == "__main__":
+    main()
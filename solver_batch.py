@@ -0,0 +1,454 @@
+import itertools
+import os
+import sys
+import time
+
+from Physics_Solver import (
+    ERROR_DIVISION_BY_ZERO,
+    ERROR_NONE,
+    TOPIC_LIBRARY,
+    _LOADED_EQUATION_FILES,
+    _checked_residuals,
+    _load_equation_files,
+    find_equation,
+    find_solve_rule,
+    load_equation_file,
+    run_solver,
+    solve_batch,
+    solve_missing_variable,
+)
+from solver_cache import PersistentSolveCache
+from solver_metrics import enable_metrics, write_metrics_file
+from solver_units import parse_quantity, variable_conversion
+
+
+# blank or missing cells are the unknown, same as leaving the prompt blank in read_known_values
+def parse_row_values(equation, row):
+    known_values = {}
+    for variable in equation.variables:
+        raw_value = row.get(variable)
+        if raw_value is None:
+            continue
+        if isinstance(raw_value, str):
+            raw_value = raw_value.strip()
+            if raw_value == "":
+                continue
+        try:
+            known_values[variable] = float(raw_value)
+        except (TypeError, ValueError):
+            # cells may carry their own unit, like "36 km/h"
+            try:
+                value, unit = parse_quantity(raw_value)
+            except (TypeError, ValueError):
+                raise ValueError(f"Invalid number for {variable}: {raw_value!r}") from None
+            try:
+                factor, offset = variable_conversion(equation, variable, unit)
+            except ValueError as error:
+                raise ValueError(f"Invalid unit for {variable}: {error}") from None
+            known_values[variable] = value * factor + offset
+    return known_values
+
+
+# solves every row on its own, a bad row gets an "error" message instead of stopping the rest.
+# with a PersistentSolveCache, rows that leave the same variable blank are looked up and
+# solved together through cache.solve_batch_with_messages, with the same results
+def solve_rows(equation, rows, cache=None):
+    if cache is not None:
+        return _solve_rows_cached(equation, rows, cache)
+    results = []
+    for row in rows:
+        result = dict(row)
+        error_message = None
+        try:
+            solved_variable, solved_value = solve_missing_variable(equation, parse_row_values(equation, row))
+            result[solved_variable] = solved_value
+        except ZeroDivisionError:
+            error_message = "division by zero occurred."
+        except ValueError as error:
+            error_message = str(error)
+        result["error"] = error_message
+        results.append(result)
+    return results
+
+
+def _solve_rows_cached(equation, rows, cache):
+    # row index -> (solved variable, value, error message)
+    outcomes = {}
+    groups = {}
+    for index, row in enumerate(rows):
+        try:
+            known_values = parse_row_values(equation, row)
+        except ValueError as error:
+            outcomes[index] = (None, None, str(error))
+            continue
+        groups.setdefault(tuple(sorted(known_values)), []).append((index, known_values))
+
+    for variables, members in groups.items():
+        columns = {variable: [known_values[variable] for _, known_values in members] for variable in variables}
+        try:
+            target, values, codes, messages = cache.solve_batch_with_messages(equation, columns)
+        except ValueError as error:
+            for index, _ in members:
+                outcomes[index] = (None, None, str(error))
+            continue
+        for (index, _), value, code, message in zip(members, values, codes, messages):
+            if code == ERROR_NONE:
+                outcomes[index] = (target, value, None)
+            elif code == ERROR_DIVISION_BY_ZERO:
+                outcomes[index] = (None, None, "division by zero occurred.")
+            else:
+                outcomes[index] = (None, None, message)
+
+    results = []
+    for index, row in enumerate(rows):
+        result = dict(row)
+        solved_variable, solved_value, error_message = outcomes[index]
+        if solved_variable is not None:
+            result[solved_variable] = solved_value
+        result["error"] = error_message
+        results.append(result)
+    return results
+
+# fully known rows checked against each equation whose variables the row has, the
+# output row gets the worst relative error and the equations it is inconsistent with
+def check_rows(equations, rows, tolerance):
+    results = [dict(row, max_relative_error=None, inconsistent="", error=None) for row in rows]
+    for equation in equations:
+        indexes = []
+        columns = {variable: [] for variable in equation.variables}
+        for index, row in enumerate(rows):
+            try:
+                known_values = parse_row_values(equation, row)
+            except ValueError as error:
+                results[index]["error"] = str(error)
+                continue
+            if len(known_values) == len(equation.variables):
+                indexes.append(index)
+                for variable, value in known_values.items():
+                    columns[variable].append(value)
+        if not indexes:
+            continue
+
+        _, relative_errors, _ = _checked_residuals(equation, columns, tolerance)
+        for index, relative_error in zip(indexes, relative_errors):
+            result = results[index]
+            if result["max_relative_error"] is None or not relative_error <= result["max_relative_error"]:
+                result["max_relative_error"] = relative_error
+            if not relative_error <= tolerance:
+                inconsistent = result["inconsistent"]
+                result["inconsistent"] = f"{inconsistent}; {equation.name}" if inconsistent else equation.name
+    return results
+
+
+def iter_input_rows(stream, input_format):
+    import csv
+    import json
+
+    if input_format == "csv":
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def iter_chunks(iterable, chunk_size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class RowWriter:
+    def __init__(self, stream, output_format, equation):
+        self.stream = stream
+        self.output_format = output_format
+        self.equation = equation
+        self.csv_writer = None
+
+    def write_rows(self, rows):
+        import csv
+        import json
+
+        if self.output_format == "jsonl":
+            for row in rows:
+                self.stream.write(json.dumps(row) + "\n")
+            return
+
+        if self.csv_writer is None:
+            fieldnames = [field for field in rows[0] if field != "error"]
+            if self.equation is not None:
+                fieldnames += [variable for variable in self.equation.variables if variable not in fieldnames]
+            fieldnames.append("error")
+            self.csv_writer = csv.DictWriter(self.stream, fieldnames, extrasaction="ignore")
+            self.csv_writer.writeheader()
+        self.csv_writer.writerows(rows)
+
+
+def find_topic_name(equation):
+    for topic_name, equations in TOPIC_LIBRARY.loaded_items():
+        if any(candidate is equation for candidate in equations):
+            return topic_name
+    return None
+
+
+# worker processes can't receive the lambdas, so they get the topic and equation name
+# and look the equation up themselves
+def _solve_rows_by_name(topic_name, equation_name, rows, cache_path=None):
+    cache = None if cache_path is None else get_persistent_cache(cache_path)
+    return solve_rows(find_equation(equation_name, topic_name), rows, cache)
+
+
+# one PersistentSolveCache per file and process, so pool workers keep their connection between chunks
+_PERSISTENT_CACHES = {}
+
+
+def get_persistent_cache(path):
+    cache = _PERSISTENT_CACHES.get(path)
+    if cache is None:
+        cache = _PERSISTENT_CACHES[path] = PersistentSolveCache(path)
+    return cache
+
+
+def _check_rows_by_name(equation_names, rows, tolerance):
+    equations = [find_equation(equation_name, topic_name) for topic_name, equation_name in equation_names]
+    return check_rows(equations, rows, tolerance)
+
+
+def _solve_batch_by_name(topic_name, equation_name, columns):
+    return solve_batch(find_equation(equation_name, topic_name), columns)[1]
+
+
+# like executor.map but keeps at most max_pending chunks in flight, so a huge input
+# isn't submitted all at once, and yields results in input order
+def map_in_order(executor, function, argument_tuples, max_pending):
+    import collections
+
+    pending = collections.deque()
+    for arguments in argument_tuples:
+        pending.append(executor.submit(function, *arguments))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def solve_batch_parallel(equation, columns, workers=None, chunk_size=65536):
+    target, _ = find_solve_rule(equation, columns)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        return solve_batch(equation, columns)
+
+    # imported here so short-lived processes that never use a pool don't pay for it at startup
+    import concurrent.futures
+
+    topic_name = find_topic_name(equation)
+    row_count = len(next(iter(columns.values()))) if columns else 0
+    chunk_columns = (
+        (
+            topic_name,
+            equation.name,
+            {variable: column[start:start + chunk_size] for variable, column in columns.items()},
+        )
+        for start in range(0, row_count, chunk_size)
+    )
+    results = []
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers, initializer=_load_equation_files, initargs=(list(_LOADED_EQUATION_FILES),)
+    ) as executor:
+        for chunk_results in map_in_order(executor, _solve_batch_by_name, chunk_columns, workers * 2):
+            results.extend(chunk_results)
+    return target, results
+
+
+# reads, solves and writes one chunk at a time so memory stays flat however big the input is.
+# with workers > 1 the chunks are solved in a process pool and written back in input order.
+def stream_solve(
+    equation,
+    input_stream,
+    output_stream,
+    input_format="csv",
+    output_format="csv",
+    chunk_size=1024,
+    workers=1,
+    cache_path=None,
+):
+    writer = RowWriter(output_stream, output_format, equation)
+    chunks = iter_chunks(iter_input_rows(input_stream, input_format), chunk_size)
+    row_count = 0
+
+    if workers <= 1:
+        cache = None if cache_path is None else get_persistent_cache(cache_path)
+        for chunk in chunks:
+            writer.write_rows(solve_rows(equation, chunk, cache))
+            row_count += len(chunk)
+        return row_count
+
+    import concurrent.futures
+
+    topic_name = find_topic_name(equation)
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers, initializer=_load_equation_files, initargs=(list(_LOADED_EQUATION_FILES),)
+    ) as executor:
+        arguments = ((topic_name, equation.name, chunk, cache_path) for chunk in chunks)
+        for results in map_in_order(executor, _solve_rows_by_name, arguments, workers * 2):
+            writer.write_rows(results)
+            row_count += len(results)
+    return row_count
+
+def stream_check(
+    equations,
+    input_stream,
+    output_stream,
+    tolerance,
+    input_format="csv",
+    output_format="csv",
+    chunk_size=1024,
+    workers=1,
+):
+    writer = RowWriter(output_stream, output_format, None)
+    chunks = iter_chunks(iter_input_rows(input_stream, input_format), chunk_size)
+    row_count = 0
+
+    if workers <= 1:
+        for chunk in chunks:
+            writer.write_rows(check_rows(equations, chunk, tolerance))
+            row_count += len(chunk)
+        return row_count
+
+    import concurrent.futures
+
+    equation_names = [(find_topic_name(equation), equation.name) for equation in equations]
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers, initializer=_load_equation_files, initargs=(list(_LOADED_EQUATION_FILES),)
+    ) as executor:
+        arguments = ((equation_names, chunk, tolerance) for chunk in chunks)
+        for results in map_in_order(executor, _check_rows_by_name, arguments, workers * 2):
+            writer.write_rows(results)
+            row_count += len(results)
+    return row_count
+
+
+def detect_format(path):
+    if path.lower().endswith((".jsonl", ".json", ".ndjson")):
+        return "jsonl"
+    return "csv"
+
+
+def open_text(path, mode):
+    if path == "-":
+        return sys.stdin if mode == "r" else sys.stdout
+    return open(path, mode, newline="", encoding="utf-8")
+
+
+def run_batch_file(equation, args):
+    input_format = args.format or detect_format(args.input)
+    output_format = args.output_format or (detect_format(args.output) if args.output != "-" else input_format)
+
+    input_stream = open_text(args.input, "r")
+    output_stream = open_text(args.output, "w")
+    start = time.perf_counter()
+    try:
+        if args.check is None:
+            row_count = stream_solve(
+                equation,
+                input_stream,
+                output_stream,
+                input_format,
+                output_format,
+                args.chunk_size,
+                args.workers,
+                args.cache_file,
+            )
+        else:
+            if equation is None:
+                equations = [equation for topic_name in TOPIC_LIBRARY for equation in TOPIC_LIBRARY[topic_name]]
+            else:
+                equations = [equation]
+            row_count = stream_check(
+                equations,
+                input_stream,
+                output_stream,
+                args.check,
+                input_format,
+                output_format,
+                args.chunk_size,
+                args.workers,
+            )
+    finally:
+        if args.cache_file in _PERSISTENT_CACHES:
+            _PERSISTENT_CACHES.pop(args.cache_file).close()
+        if input_stream is not sys.stdin:
+            input_stream.close()
+        if output_stream is not sys.stdout:
+            output_stream.close()
+        else:
+            output_stream.flush()
+    elapsed = time.perf_counter() - start
+
+    rate = row_count / elapsed if elapsed > 0 else float("inf")
+    action = "Solved" if args.check is None else "Checked"
+    print(f"{action} {row_count} rows in {elapsed:.2f}s ({rate:,.0f} rows/s)", file=sys.stderr)
+
+
+def build_argument_parser():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Physics equation solver. Starts the interactive menu unless --equation is given."
+    )
+    parser.add_argument("--equation", help="equation name (or a unique part of it) to solve every row against")
+    parser.add_argument(
+        "--equations-file", action="append", default=[], help="JSON file of extra equations to load (repeatable)"
+    )
+    parser.add_argument("--input", default="-", help="CSV or JSONL file with one column per variable, - for stdin")
+    parser.add_argument("--output", default="-", help="where to write solved rows, - for stdout")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="input format (default: from the file extension)")
+    parser.add_argument("--output-format", choices=["csv", "jsonl"], help="output format (default: same as input)")
+    parser.add_argument("--chunk-size", type=int, default=1024, help="rows read and solved at a time")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes to solve chunks in (default: 1)")
+    parser.add_argument("--cache-file", help="SQLite file to keep solved rows in, shared by workers and later runs")
+    parser.add_argument(
+        "--check",
+        type=float,
+        metavar="TOLERANCE",
+        help="check fully known rows against --equation (default: every equation whose columns are present) "
+        "and flag rows whose relative error is above TOLERANCE instead of solving",
+    )
+    parser.add_argument(
+        "--metrics-file", help="record solve metrics and write them here in Prometheus text format (single process)"
+    )
+    return parser
+
+
+def main(argv=None):
+    parser = build_argument_parser()
+    args = parser.parse_args(argv)
+    for path in args.equations_file:
+        try:
+            load_equation_file(path)
+        except (OSError, KeyError, ValueError) as error:
+            parser.error(f"could not load {path}: {error}")
+
+    if args.equation is None and args.check is None:
+        run_solver()
+        return
+
+    equation = None
+    if args.equation is not None:
+        try:
+            equation = find_equation(args.equation)
+        except ValueError as error:
+            parser.error(str(error))
+    if args.metrics_file:
+        enable_metrics()
+    run_batch_file(equation, args)
+    if args.metrics_file:
+        write_metrics_file(args.metrics_file)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import timeit
+
+from Physics_Solver import (
+    TOPIC_LIBRARY,
+    find_equation,
+    solve_batch,
+    solve_missing_variable,
+)
+from solver_batch import solve_batch_parallel
+
+
+SAMPLE_INPUTS = [2.0, 3.0, 5.0, 7.0, 11.0]
+
+
+# picks values for the first rule's inputs, solves it, and so ends up with a full set of
+# values that agree with the equation. every other rule can then be fed from the same set.
+def sample_known_values(equation):
+    first_target, first_rule = next(iter(equation.solve_rules.items()))
+    values = dict(zip(first_rule["requires"], SAMPLE_INPUTS))
+    values[first_target] = first_rule["formula"](values)
+    return values
+
+
+def iter_solve_targets():
+    for topic_name, equations in TOPIC_LIBRARY.items():
+        for equation in equations:
+            values = sample_known_values(equation)
+            for target, rule in equation.solve_rules.items():
+                yield topic_name, equation, target, rule, values
+
+
+def time_per_call_ns(statement, namespace, repeat, number):
+    best = min(timeit.repeat(statement, globals=namespace, repeat=repeat, number=number))
+    return best / number * 1e9
+
+
+# "solve ns" is the whole scalar path (solve_missing_variable), which calls the kernel
+# with the values pulled out of the dict. "dict ns" is the rule's dict formula on its own,
+# and the kernel is timed on a ready-made tuple the way map() hands columns over.
+def bench_kernels(args):
+    print(f"{'equation':<48} {'target':<14} {'solve ns':>9} {'dict ns':>9} {'kernel ns':>10} {'speedup':>8}")
+    for _, equation, target, rule, values in iter_solve_targets():
+        known = {variable: values[variable] for variable in rule["requires"]}
+        positional = tuple(known[variable] for variable in rule["requires"])
+        formula = rule["formula"]
+        kernel = rule["kernel"]
+
+        namespace = {
+            "formula": formula,
+            "kernel": kernel,
+            "known": known,
+            "positional": positional,
+            "equation": equation,
+            "solve_missing_variable": solve_missing_variable,
+        }
+        solve_ns = time_per_call_ns("solve_missing_variable(equation, known)", namespace, args.repeat, args.number)
+        dict_ns = time_per_call_ns("formula(known)", namespace, args.repeat, args.number)
+        kernel_ns = time_per_call_ns("kernel(*positional)", namespace, args.repeat, args.number)
+
+        print(
+            f"{equation.name[:48]:<48} {target:<14} {solve_ns:>9.1f} {dict_ns:>9.1f} {kernel_ns:>10.1f}"
+            f" {dict_ns / kernel_ns:>7.2f}x"
+        )
+
+
+# jitters the consistent sample values a little so every row is different but still solvable
+def sample_columns(equation, target, row_count, seed=0):
+    rng = random.Random(seed)
+    values = sample_known_values(equation)
+    return {
+        variable: [value * (1 + rng.uniform(-0.01, 0.01)) for _ in range(row_count)]
+        for variable, value in values.items()
+        if variable != target
+    }
+
+
+def bench_scaling(args):
+    equation = find_equation(args.equation)
+    target = args.target or next(iter(equation.solve_rules))
+    columns = sample_columns(equation, target, args.rows)
+
+    cpu_count = os.cpu_count() or 1
+    worker_counts = sorted({count for count in [1, 2, 4, 8, cpu_count] if count <= max(cpu_count, 8)})
+
+    print(f"{equation.name}, solving {target} for {args.rows} rows")
+    print(f"{'workers':>8} {'seconds':>9} {'rows/s':>12} {'speedup':>8}")
+    base_rate = None
+    for workers in worker_counts:
+        start = time.perf_counter()
+        solve_batch_parallel(equation, columns, workers=workers, chunk_size=args.chunk_size)
+        elapsed = time.perf_counter() - start
+        rate = args.rows / elapsed
+        base_rate = base_rate or rate
+        print(f"{workers:>8} {elapsed:>9.3f} {rate:>12,.0f} {rate / base_rate:>7.2f}x")
+
+
+FIRST_TOPIC_SCRIPT = """
+import time
+start = time.perf_counter()
+import Physics_Solver
+imported = time.perf_counter()
+Physics_Solver.TOPIC_LIBRARY[{topic!r}]
+one_topic = time.perf_counter()
+for topic_name in Physics_Solver.TOPIC_LIBRARY:
+    Physics_Solver.TOPIC_LIBRARY[topic_name]
+print(imported - start, one_topic - imported, time.perf_counter() - one_topic)
+"""
+
+
+# every run is a fresh interpreter, like a short-lived batch worker starting up
+def measure_import_time_us():
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import Physics_Solver"],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        check=True,
+    )
+    for line in completed.stderr.splitlines():
+        fields = [field.strip() for field in line.split("|")]
+        if len(fields) == 3 and fields[2] == "Physics_Solver":
+            return int(fields[0].split(":")[1]), int(fields[1])
+    raise RuntimeError("Physics_Solver missing from -X importtime output")
+
+
+def measure_topic_build_seconds(topic_name):
+    completed = subprocess.run(
+        [sys.executable, "-c", FIRST_TOPIC_SCRIPT.format(topic=topic_name)],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        check=True,
+    )
+    return [float(value) for value in completed.stdout.split()]
+
+
+def bench_import_time(args):
+    topic_name = next(iter(TOPIC_LIBRARY))
+    import_times = [measure_import_time_us() for _ in range(args.runs)]
+    build_times = [measure_topic_build_seconds(topic_name) for _ in range(args.runs)]
+
+    self_us = statistics.median(sample[0] for sample in import_times)
+    cumulative_us = statistics.median(sample[1] for sample in import_times)
+    print(f"import Physics_Solver (-X importtime, median of {args.runs} cold processes)")
+    print(f"  self:        {self_us / 1000:8.2f} ms")
+    print(f"  cumulative:  {cumulative_us / 1000:8.2f} ms")
+    print(f"first access to {topic_name!r}: {statistics.median(sample[1] for sample in build_times) * 1000:8.2f} ms")
+    print(f"building the remaining topics:        {statistics.median(sample[2] for sample in build_times) * 1000:8.2f} ms")
+
+
+ERROR_PATH_STATEMENT = """
+try:
+    solve(equation, known)
+except (ZeroDivisionError, ValueError):
+    pass
+"""
+
+BAD_INPUT_VALUES = [0.0, -1e6, 1e6, -1.0]
+
+# metric name -> True when a bigger number is better
+SUITE_METRICS = {
+    "scalar_ns": False,
+    "batch_rows_per_s": True,
+    "zero_division_ns": False,
+    "value_error_ns": False,
+}
+
+
+# tries a few bad values for each input until it finds a set of known values that makes
+# the rule raise the given error, or None if none of them do
+def find_error_inputs(equation, known, error_type):
+    for variable in known:
+        for bad_value in BAD_INPUT_VALUES:
+            candidate = dict(known)
+            candidate[variable] = bad_value
+            try:
+                solve_missing_variable(equation, candidate)
+            except error_type:
+                return candidate
+            except (ZeroDivisionError, ValueError):
+                pass
+    return None
+
+
+def run_suite(args):
+    results = {}
+    for topic_name, equation, target, rule, values in iter_solve_targets():
+        known = {variable: value for variable, value in values.items() if variable != target}
+        namespace = {"solve": solve_missing_variable, "equation": equation, "known": known}
+        result = {"scalar_ns": time_per_call_ns("solve(equation, known)", namespace, args.repeat, args.number)}
+
+        columns = sample_columns(equation, target, args.batch_rows)
+        try:
+            solve_batch(equation, columns)
+        except (ZeroDivisionError, ValueError):
+            pass
+        else:
+            batch_seconds = min(
+                timeit.repeat(lambda: solve_batch(equation, columns), repeat=args.repeat, number=1)
+            )
+            result["batch_rows_per_s"] = args.batch_rows / batch_seconds
+
+        for metric, error_type in [("zero_division_ns", ZeroDivisionError), ("value_error_ns", ValueError)]:
+            bad_known = find_error_inputs(equation, known, error_type)
+            if bad_known is not None:
+                namespace = {"solve": solve_missing_variable, "equation": equation, "known": bad_known}
+                result[metric] = time_per_call_ns(ERROR_PATH_STATEMENT, namespace, args.repeat, args.number)
+
+        key = f"{topic_name} :: {equation.name} :: {target}"
+        results[key] = result
+        print(f"{key}: " + ", ".join(f"{metric}={value:,.1f}" for metric, value in result.items()), flush=True)
+
+    return {
+        "meta": {
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "number": args.number,
+            "batch_rows": args.batch_rows,
+        },
+        "results": results,
+    }
+
+
+# returns (key, metric, baseline, current, percent worse) for every metric that got worse
+# by more than threshold percent
+def find_regressions(baseline, current, threshold):
+    regressions = []
+    for key, metrics in current["results"].items():
+        baseline_metrics = baseline["results"].get(key, {})
+        for metric, value in metrics.items():
+            baseline_value = baseline_metrics.get(metric)
+            if not baseline_value:
+                continue
+            if SUITE_METRICS[metric]:
+                percent_worse = (baseline_value - value) / baseline_value * 100
+            else:
+                percent_worse = (value - baseline_value) / baseline_value * 100
+            if percent_worse > threshold:
+                regressions.append((key, metric, baseline_value, value, percent_worse))
+    return regressions
+
+
+# a missing baseline is an error, not a pass: timings only mean something against a
+# baseline from the same machine, so it has to be recorded there on purpose first
+def bench_suite(args):
+    if not args.update_baseline and not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}, run again with --update-baseline to record one.", file=sys.stderr)
+        return 2
+
+    current = run_suite(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(current, output_file, indent=2)
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as baseline_file:
+            json.dump(current, baseline_file, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as baseline_file:
+        baseline = json.load(baseline_file)
+    regressions = find_regressions(baseline, current, args.threshold)
+    if not regressions:
+        print(f"No regressions over {args.threshold:g}% against {args.baseline}")
+        return 0
+
+    print(f"{len(regressions)} regressions over {args.threshold:g}% against {args.baseline}:")
+    for key, metric, baseline_value, value, percent_worse in regressions:
+        print(f"  {key} {metric}: {baseline_value:,.1f} -> {value:,.1f} ({percent_worse:+.1f}%)")
+    return 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for the physics solver.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--number", type=int, default=20000)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("kernels", help="per-solve ns of solve_missing_variable, dict formulas and positional kernels")
+
+    scaling = commands.add_parser("scaling", help="solve_batch_parallel throughput at 1, 2, 4, 8 and N workers")
+    scaling.add_argument("--equation", default="2nd Equation of Motion")
+    scaling.add_argument("--target", help="variable to solve for (default: the equation's first)")
+    scaling.add_argument("--rows", type=int, default=1000000)
+    scaling.add_argument("--chunk-size", type=int, default=65536)
+
+    import_time = commands.add_parser("import-time", help="cold import cost and lazy topic build cost")
+    import_time.add_argument("--runs", type=int, default=10)
+
+    suite = commands.add_parser("suite", help="every equation and target, compared against a stored baseline")
+    suite.add_argument("--batch-rows", type=int, default=10000)
+    suite.add_argument("--output", help="also write this run's results to this JSON file")
+    suite.add_argument("--baseline", default="solver_benchmark_baseline.json")
+    suite.add_argument("--update-baseline", action="store_true", help="store this run as the new baseline")
+    suite.add_argument("--threshold", type=float, default=10.0, help="percent slowdown that counts as a regression")
+
+    args = parser.parse_args()
+    if args.command == "kernels":
+        bench_kernels(args)
+    elif args.command == "scaling":
+        bench_scaling(args)
+    elif args.command == "import-time":
+        bench_import_time(args)
+    elif args.command == "suite":
+        sys.exit(bench_suite(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,407 @@
+import math
+import os
+import time
+
+from Physics_Solver import (
+    ERROR_DESCRIPTIONS,
+    ERROR_DIVISION_BY_ZERO,
+    ERROR_NONE,
+    ERROR_OTHER,
+    classify_solver_error,
+    find_solve_rule,
+    solve_batch_masked,
+    solve_missing_variable,
+)
+
+
+# optional memo in front of solve_missing_variable. keyed on the equation object plus its
+# known values, bounded by max_size (least recently used goes first) and optionally by a
+# ttl in seconds. ZeroDivisionError / ValueError outcomes are cached too and raised again
+# on a hit, so callers handle them exactly like before.
+class SolveCache:
+    def __init__(self, max_size=1024, ttl=None, clock=time.monotonic):
+        import collections
+
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def make_key(self, equation, known_values):
+        values = [(variable, float(value)) for variable, value in known_values.items() if variable in equation.variables]
+        return equation, tuple(sorted(values))
+
+    def solve(self, equation, known_values):
+        key = self.make_key(equation, known_values)
+        entry = self.entries.get(key)
+        if entry is not None:
+            expires_at, outcome, error = entry
+            if expires_at is not None and self.clock() >= expires_at:
+                del self.entries[key]
+                self.expirations += 1
+            else:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                if error is not None:
+                    raise error[0](*error[1])
+                return outcome
+
+        self.misses += 1
+        try:
+            outcome = solve_missing_variable(equation, known_values)
+        except (ZeroDivisionError, ValueError) as error:
+            self._store(key, None, (type(error), error.args))
+            raise
+        self._store(key, outcome, None)
+        return outcome
+
+    def _store(self, key, outcome, error):
+        expires_at = None if self.ttl is None else self.clock() + self.ttl
+        self.entries[key] = (expires_at, outcome, error)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+# (value, ERROR_* code, message) for one row, the way solve_missing_variable ends for it
+def _solve_outcome(equation, known_values):
+    try:
+        value = float(solve_missing_variable(equation, known_values)[1])
+    except (ZeroDivisionError, ValueError) as error:
+        return None, classify_solver_error(error), str(error)
+    except TypeError:
+        # a complex result, sqlite can't keep it and nothing downstream expects it
+        return None, ERROR_OTHER, ERROR_DESCRIPTIONS[ERROR_OTHER]
+    return value, ERROR_NONE, None
+
+
+def _hash_code(digest, code):
+    digest.update(code.co_code)
+    digest.update(repr(code.co_names).encode())
+    for constant in code.co_consts:
+        # nested code objects (comprehensions, inner functions) repr with their address
+        if hasattr(constant, "co_code"):
+            _hash_code(digest, constant)
+        else:
+            digest.update(repr(constant).encode())
+
+
+# the code plus any numbers, strings or functions it closes over (other objects repr with
+# their address, so they are left out)
+def _hash_function(digest, function):
+    _hash_code(digest, function.__code__)
+    for cell in function.__closure__ or ():
+        try:
+            value = cell.cell_contents
+        except ValueError:
+            continue
+        if isinstance(value, (int, float, str)):
+            digest.update(repr(value).encode())
+        elif hasattr(value, "__code__") and value is not function:
+            _hash_function(digest, value)
+
+
+_EQUATION_FINGERPRINTS = {}
+
+
+# a short hash of the equation's variables and every rule's kernel code, so editing a
+# formula (in code or in an equations file) gives new cache keys instead of old results.
+# numeric rules solve through the other rules, so those are covered too. worked out once
+# per equation object
+def equation_fingerprint(equation):
+    fingerprint = _EQUATION_FINGERPRINTS.get(equation)
+    if fingerprint is None:
+        import hashlib
+
+        digest = hashlib.sha256(repr(sorted(equation.variables)).encode())
+        for target in sorted(equation.solve_rules):
+            rule = equation.solve_rules[target]
+            digest.update(repr((target, rule["requires"])).encode())
+            _hash_function(digest, rule["kernel"])
+        fingerprint = _EQUATION_FINGERPRINTS[equation] = digest.hexdigest()[:16]
+    return fingerprint
+
+
+# same idea as SolveCache but kept in an SQLite file, so worker processes and later runs
+# share results. rows are keyed by equation name plus equation_fingerprint, target and the
+# known values written out with repr (exact for floats). once the file holds more than
+# max_entries, the least recently used rows go first, down to max_entries minus
+# evict_fraction of it, so the rows are only counted again every so often.
+class PersistentSolveCache:
+    def __init__(self, path, max_entries=1_000_000, busy_timeout=30.0, evict_every=64, evict_fraction=0.1):
+        import threading
+
+        self.path = path
+        self.max_entries = max_entries
+        self.busy_timeout = busy_timeout
+        self.evict_every = evict_every
+        self.evict_fraction = evict_fraction
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        self.connection = None
+        self.connection_pid = None
+        self.touched = []
+        # rows in the file as far as this process knows: counted on connect, then kept up
+        # to date with its own inserts and deletes
+        self.row_count = 0
+
+    def _connect(self):
+        # a connection can't be shared with a forked child, so every process opens its own
+        if self.connection is not None and self.connection_pid == os.getpid():
+            return self.connection
+
+        import sqlite3
+
+        connection = sqlite3.connect(self.path, timeout=self.busy_timeout, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        with connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS solve_results ("
+                "equation TEXT NOT NULL, target TEXT NOT NULL, known TEXT NOT NULL, "
+                "value REAL, code INTEGER NOT NULL, message TEXT, last_used REAL NOT NULL, "
+                "PRIMARY KEY (equation, target, known))"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS solve_results_last_used ON solve_results (last_used)")
+        (self.row_count,) = connection.execute("SELECT COUNT(*) FROM solve_results").fetchone()
+        self.connection = connection
+        self.connection_pid = os.getpid()
+        self.touched = []
+        return connection
+
+    @staticmethod
+    def make_equation_key(equation):
+        return f"{equation.name} [{equation_fingerprint(equation)}]"
+
+    @staticmethod
+    def make_known_key(variables, values):
+        return ";".join(f"{variable}={float(value)!r}" for variable, value in zip(variables, values))
+
+    # rows with a nan input are solved but never stored: nan can't be looked up again, and
+    # whether it fails depends on the formula, not on the row
+    def solve(self, equation, known_values):
+        target, _ = find_solve_rule(equation, known_values)
+        variables = sorted(variable for variable in known_values if variable in equation.variables)
+        row = [known_values[variable] for variable in variables]
+        if any(value != value for value in row):
+            return solve_missing_variable(equation, known_values)
+        known = self.make_known_key(variables, row)
+        equation_key = self.make_equation_key(equation)
+
+        with self.lock:
+            connection = self._connect()
+            row = connection.execute(
+                "SELECT value, code, message FROM solve_results WHERE equation = ? AND target = ? AND known = ?",
+                (equation_key, target, known),
+            ).fetchone()
+            if row is not None:
+                self.hits += 1
+                self.touched.append((time.time(), equation_key, target, known))
+                if len(self.touched) >= self.evict_every:
+                    self._flush_touched(connection)
+                value, code, message = row
+                if code == ERROR_DIVISION_BY_ZERO:
+                    raise ZeroDivisionError(message)
+                if code != ERROR_NONE:
+                    raise ValueError(message)
+                # sqlite keeps nan as NULL
+                return target, math.nan if value is None else value
+
+            self.misses += 1
+            try:
+                outcome = solve_missing_variable(equation, known_values)
+            except (ZeroDivisionError, ValueError) as error:
+                code = classify_solver_error(error)
+                self._store(connection, [(equation_key, target, known, None, code, str(error))])
+                raise
+            self._store(connection, [(equation_key, target, known, outcome[1], ERROR_NONE, None)])
+            return outcome
+
+    # solve_batch_masked with the cache in front: one lookup per chunk of rows, and only
+    # the rows (and repeated rows only once) that aren't cached yet get solved
+    def solve_batch(self, equation, columns, lookup_chunk_size=500):
+        target, values, codes, _ = self.solve_batch_with_messages(equation, columns, lookup_chunk_size)
+        return target, values, codes
+
+    # same as solve_batch, plus each row's error message (None for rows that solved). rows
+    # the masked kernel fails are solved again on their own, so their value, code and
+    # message are exactly what solve() gives, whichever of the two fills the cache
+    def solve_batch_with_messages(self, equation, columns, lookup_chunk_size=500):
+        target, _ = find_solve_rule(equation, columns)
+        variables = sorted(variable for variable in columns if variable in equation.variables)
+        row_count = len(columns[variables[0]]) if variables else 0
+        rows = list(zip(*[columns[variable] for variable in variables]))
+        # rows with a nan input get a key of None, they are solved every time and not stored
+        known_keys = [
+            None if any(value != value for value in row) else self.make_known_key(variables, row) for row in rows
+        ]
+        equation_key = self.make_equation_key(equation)
+
+        with self.lock:
+            connection = self._connect()
+            cached = {}
+            unique_keys = [known for known in dict.fromkeys(known_keys) if known is not None]
+            for start in range(0, len(unique_keys), lookup_chunk_size):
+                chunk = unique_keys[start : start + lookup_chunk_size]
+                placeholders = ", ".join("?" * len(chunk))
+                cached.update(
+                    (known, (value, code, message))
+                    for known, value, code, message in connection.execute(
+                        "SELECT known, value, code, message FROM solve_results "
+                        f"WHERE equation = ? AND target = ? AND known IN ({placeholders})",
+                        [equation_key, target, *chunk],
+                    )
+                )
+
+            now = time.time()
+            self.touched.extend((now, equation_key, target, known) for known in cached)
+            hit_count = sum(1 for known in known_keys if known in cached)
+            missing_rows = []
+            for index, known in enumerate(known_keys):
+                if known is None or known not in cached:
+                    missing_rows.append(index)
+                    if known is not None:
+                        # repeats of this row are filled in from the same solve
+                        cached[known] = None
+
+            nan_input_outcomes = {}
+            if missing_rows:
+                missing_columns = {
+                    variable: [rows[index][position] for index in missing_rows]
+                    for position, variable in enumerate(variables)
+                }
+                _, values, codes = solve_batch_masked(equation, missing_columns)
+                new_rows = []
+                for index, value, code in zip(missing_rows, values, codes):
+                    message = None
+                    if code != ERROR_NONE:
+                        value, code, message = _solve_outcome(equation, dict(zip(variables, rows[index])))
+                    if known_keys[index] is None:
+                        nan_input_outcomes[index] = (value, code, message)
+                    else:
+                        cached[known_keys[index]] = (value, code, message)
+                        new_rows.append((equation_key, target, known_keys[index], value, code, message))
+                self._store(connection, new_rows)
+            else:
+                self._flush_touched(connection)
+
+        values = [math.nan] * row_count
+        codes = [ERROR_NONE] * row_count
+        messages = [None] * row_count
+        for index, known in enumerate(known_keys):
+            value, code, message = cached[known] if known is not None else nan_input_outcomes[index]
+            values[index] = math.nan if value is None else value
+            codes[index] = code
+            messages[index] = message
+        self.hits += hit_count
+        self.misses += row_count - hit_count
+        return target, values, codes, messages
+
+    def _flush_touched(self, connection, chunk_size=500):
+        if not self.touched:
+            return
+        # a batch touches all its rows at the same time, so they go in one UPDATE per chunk
+        groups = {}
+        for used, equation_key, target, known in self.touched:
+            groups.setdefault((used, equation_key, target), []).append(known)
+        with connection:
+            for (used, equation_key, target), keys in groups.items():
+                for start in range(0, len(keys), chunk_size):
+                    chunk = keys[start : start + chunk_size]
+                    placeholders = ", ".join("?" * len(chunk))
+                    connection.execute(
+                        "UPDATE solve_results SET last_used = MAX(last_used, ?) "
+                        f"WHERE equation = ? AND target = ? AND known IN ({placeholders})",
+                        [used, equation_key, target, *chunk],
+                    )
+        self.touched = []
+
+    def _store(self, connection, rows):
+        if not rows:
+            self._flush_touched(connection)
+            return
+        now = time.time()
+        with connection:
+            # another process may have stored the same row meanwhile, with the same result
+            cursor = connection.executemany(
+                "INSERT OR IGNORE INTO solve_results (equation, target, known, value, code, message, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [row + (now,) for row in rows],
+            )
+        self.row_count += cursor.rowcount
+        self._flush_touched(connection)
+        if self.row_count > self.max_entries:
+            self._evict(connection)
+
+    # the running count misses other processes' inserts and deletes, so it is only trusted
+    # to say when to look: the real count is taken here, once per evict_fraction of the file
+    def _evict(self, connection):
+        with connection:
+            (size,) = connection.execute("SELECT COUNT(*) FROM solve_results").fetchone()
+            excess = size - self.max_entries
+            if excess > 0:
+                excess += int(self.max_entries * self.evict_fraction)
+                deleted = connection.execute(
+                    "DELETE FROM solve_results WHERE rowid IN "
+                    "(SELECT rowid FROM solve_results ORDER BY last_used LIMIT ?)",
+                    (excess,),
+                ).rowcount
+                self.evictions += deleted
+                size -= deleted
+        self.row_count = size
+
+    def flush(self):
+        with self.lock:
+            if self.connection is not None and self.connection_pid == os.getpid():
+                self._flush_touched(self.connection)
+
+    def clear(self):
+        with self.lock:
+            connection = self._connect()
+            with connection:
+                connection.execute("DELETE FROM solve_results")
+            self.touched = []
+            self.row_count = 0
+
+    def close(self):
+        self.flush()
+        with self.lock:
+            if self.connection is not None and self.connection_pid == os.getpid():
+                self.connection.close()
+            self.connection = None
+
+    def stats(self):
+        with self.lock:
+            self._connect()
+            size = self.row_count
+        lookups = self.hits + self.misses
+        return {
+            "size": size,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,90 @@
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+
+from Physics_Solver import find_equation
+
+
+def make_requests(equation, count, seed):
+    rng = random.Random(seed)
+    target, rule = next(iter(equation.solve_rules.items()))
+    return [
+        {
+            "id": request_id,
+            "equation": equation.name,
+            "known": {variable: rng.uniform(1, 100) for variable in rule["requires"]},
+        }
+        for request_id in range(count)
+    ]
+
+
+# each connection keeps up to `depth` requests in flight and records the time from
+# sending a request to reading its response
+async def run_connection(args, requests, latencies, errors):
+    if args.unix:
+        reader, writer = await asyncio.open_unix_connection(args.unix)
+    else:
+        reader, writer = await asyncio.open_connection(args.host, args.port)
+
+    sent_at = {}
+    window = asyncio.Semaphore(args.depth)
+
+    async def read_responses():
+        for _ in range(len(requests)):
+            response = json.loads(await reader.readline())
+            latencies.append(time.perf_counter() - sent_at.pop(response["id"]))
+            if "error" in response:
+                errors.append(response["error"])
+            window.release()
+
+    reading = asyncio.create_task(read_responses())
+    for request in requests:
+        await window.acquire()
+        sent_at[request["id"]] = time.perf_counter()
+        writer.write((json.dumps(request) + "\n").encode())
+        await writer.drain()
+    await reading
+    writer.close()
+
+
+async def run_load(args):
+    equation = find_equation(args.equation)
+    requests = make_requests(equation, args.requests, args.seed)
+    shards = [requests[index::args.connections] for index in range(args.connections)]
+    latencies = []
+    errors = []
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run_connection(args, shard, latencies, errors) for shard in shards))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    cut_points = statistics.quantiles(latencies, n=100)
+    print(f"{len(latencies)} requests over {args.connections} connections in {elapsed:.2f}s")
+    print(f"  throughput: {len(latencies) / elapsed:,.0f} requests/s")
+    print(f"  p50:        {cut_points[49] * 1000:.3f} ms")
+    print(f"  p99:        {cut_points[98] * 1000:.3f} ms")
+    print(f"  max:        {latencies[-1] * 1000:.3f} ms")
+    if errors:
+        print(f"  errors:     {len(errors)} (first: {errors[0]})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load generator for solver_server.py.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="connect to this Unix socket path instead of TCP")
+    parser.add_argument("--equation", default="Ohm's Law")
+    parser.add_argument("--requests", type=int, default=100000)
+    parser.add_argument("--connections", type=int, default=16)
+    parser.add_argument("--depth", type=int, default=64, help="requests in flight per connection")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    asyncio.run(run_load(args))
+
+
+if __name__ == "__main__":
+    main()
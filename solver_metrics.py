@@ -0,0 +1,113 @@
+import bisect
+import os
+
+import Physics_Solver
+
+
+LATENCY_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 1e-3, 1e-2, 1e-1)
+
+_METRIC_HELP = {
+    "solve": "Time spent in solve_missing_variable, including validation.",
+    "formula": "Time spent in the solve rule's formula.",
+}
+
+
+class SolverMetrics:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        import threading
+
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        # kind -> (equation name, target) -> [bucket counts..., overflow count, sum of seconds]
+        self.latencies = {kind: {} for kind in _METRIC_HELP}
+        # (equation name, target, exception type name) -> count
+        self.errors = {}
+
+    def observe(self, kind, equation_name, target, seconds):
+        with self.lock:
+            series = self.latencies[kind].get((equation_name, target))
+            if series is None:
+                series = [0] * (len(self.buckets) + 1) + [0.0]
+                self.latencies[kind][(equation_name, target)] = series
+            series[bisect.bisect_left(self.buckets, seconds)] += 1
+            series[-1] += seconds
+
+    def count_error(self, equation_name, target, error_name):
+        key = (equation_name, target, error_name)
+        with self.lock:
+            self.errors[key] = self.errors.get(key, 0) + 1
+
+    def to_prometheus_text(self):
+        lines = []
+        with self.lock:
+            for kind, help_text in _METRIC_HELP.items():
+                name = f"physics_solver_{kind}_seconds"
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for (equation_name, target), series in sorted(self.latencies[kind].items()):
+                    labels = f'equation="{_escape_label(equation_name)}",target="{_escape_label(target)}"'
+                    cumulative = 0
+                    for bound, count in zip(self.buckets, series):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+                    cumulative += series[len(self.buckets)]
+                    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {cumulative}')
+                    lines.append(f"{name}_sum{{{labels}}} {series[-1]!r}")
+                    lines.append(f"{name}_count{{{labels}}} {cumulative}")
+
+            lines.append("# HELP physics_solver_errors_total Solves that raised, by exception type.")
+            lines.append("# TYPE physics_solver_errors_total counter")
+            for (equation_name, target, error_name), count in sorted(self.errors.items()):
+                labels = (
+                    f'equation="{_escape_label(equation_name)}",target="{_escape_label(target)}",'
+                    f'error="{_escape_label(error_name)}"'
+                )
+                lines.append(f"physics_solver_errors_total{{{labels}}} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape_label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def enable_metrics(metrics=None):
+    Physics_Solver.SOLVER_METRICS = metrics if metrics is not None else SolverMetrics()
+    return Physics_Solver.SOLVER_METRICS
+
+
+def disable_metrics():
+    Physics_Solver.SOLVER_METRICS = None
+
+
+def write_metrics_file(path, metrics=None):
+    metrics = metrics or Physics_Solver.SOLVER_METRICS
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, "w", encoding="utf-8") as metrics_file:
+        metrics_file.write(metrics.to_prometheus_text())
+    os.replace(temporary_path, path)
+
+
+# serves /metrics from a background thread; call .shutdown() on the result to stop it
+def serve_metrics(port, host="127.0.0.1", metrics=None):
+    import http.server
+    import threading
+
+    class MetricsHandler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            current = metrics or Physics_Solver.SOLVER_METRICS
+            if self.path.split("?")[0] != "/metrics" or current is None:
+                self.send_error(404)
+                return
+            body = current.to_prometheus_text().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
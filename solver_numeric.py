@@ -0,0 +1,206 @@
+import math
+
+from Physics_Solver import make_rule
+
+
+# numeric fallback for targets without a hand-written inverse. any other rule of the
+# equation that takes the target as an input gives a residual, e.g. for m in
+# E_k = 0.5*m*v^2 it is rule_E_k(m, v) - E_k, and its root is found with Brent's method.
+_NUMERIC_RULES = {}
+
+
+def find_residual_rules(equation, target):
+    return [
+        (anchor, solve_rule)
+        for anchor, solve_rule in equation.solve_rules.items()
+        if anchor != target and target in solve_rule["requires"]
+    ]
+
+
+def get_numeric_rule(equation, target):
+    key = (equation, target)
+    if key not in _NUMERIC_RULES:
+        if target not in equation.variables or not find_residual_rules(equation, target):
+            _NUMERIC_RULES[key] = None
+        else:
+            requires = [variable for variable in equation.variables if variable != target]
+
+            def kernel(*values):
+                columns = {variable: [value] for variable, value in zip(requires, values)}
+                (value,), (converged,), _ = solve_numeric_batch(equation, target, columns)
+                if not converged:
+                    raise ValueError(f"Cannot solve {target}: no numeric solution found.")
+                return value
+
+            rule = make_rule(requires, kernel)
+            rule["numeric"] = True
+            _NUMERIC_RULES[key] = rule
+    return _NUMERIC_RULES[key]
+
+
+def _guarded(function):
+    def guarded(x):
+        try:
+            return function(x)
+        except (ZeroDivisionError, ValueError, OverflowError):
+            return math.nan
+
+    return guarded
+
+
+# walks outwards from x0 on both sides, doubling the step, and yields every pair of
+# neighbouring points where the residual changes sign. points where the formula fails
+# are skipped. counter[0] is bumped for every residual evaluation.
+def _iter_brackets(function, x0, max_expansions, counter):
+    f0 = function(x0)
+    counter[0] += 1
+    if f0 == 0:
+        yield x0, x0, f0, f0
+        return
+
+    step = max(abs(x0) * 0.01, 1e-3)
+    last_points = [(x0, f0), (x0, f0)]
+    for _ in range(max_expansions):
+        for side, x in enumerate((x0 - step, x0 + step)):
+            fx = function(x)
+            counter[0] += 1
+            if fx != fx:
+                continue
+            if fx == 0:
+                yield x, x, fx, fx
+                return
+            previous_x, previous_f = last_points[side]
+            if previous_f == previous_f and (previous_f < 0) != (fx < 0):
+                yield previous_x, x, previous_f, fx
+            last_points[side] = (x, fx)
+        step *= 2
+
+
+# Brent's method (as in Numerical Recipes zbrent), a and b must bracket a sign change
+def _brent(function, a, b, fa, fb, tolerance, max_iterations):
+    c, fc = b, fb
+    d = e = b - a
+    for iteration in range(1, max_iterations + 1):
+        if (fb > 0) == (fc > 0):
+            c, fc = a, fa
+            d = e = b - a
+        if abs(fc) < abs(fb):
+            a, b, c = b, c, b
+            fa, fb, fc = fb, fc, fb
+
+        tol = 2 * 2.2e-16 * abs(b) + 0.5 * tolerance
+        middle = 0.5 * (c - b)
+        if abs(middle) <= tol or fb == 0:
+            return b, fb, True, iteration
+
+        if abs(e) >= tol and abs(fa) > abs(fb):
+            s = fb / fa
+            if a == c:
+                p = 2 * middle * s
+                q = 1 - s
+            else:
+                q = fa / fc
+                r = fb / fc
+                p = s * (2 * middle * q * (q - r) - (b - a) * (r - 1))
+                q = (q - 1) * (r - 1) * (s - 1)
+            if p > 0:
+                q = -q
+            p = abs(p)
+            if 2 * p < min(3 * middle * q - abs(tol * q), abs(e * q)):
+                e = d
+                d = p / q
+            else:
+                d = e = middle
+        else:
+            d = e = middle
+
+        a, fa = b, fb
+        b += d if abs(d) > tol else math.copysign(tol, middle)
+        fb = function(b)
+        if fb != fb:
+            return b, fb, False, iteration
+    return b, fb, False, max_iterations
+
+
+# physical quantities are mostly non-negative (v from E_k = 0.5*m*v^2 is 4, not -4), so a
+# negative root is only returned if the search runs out without finding a non-negative one
+def _numeric_root(residual, x0, tolerance, max_iterations):
+    counter = [0]
+    negative_root = None
+    for a, b, fa, fb in _iter_brackets(residual, x0, max_iterations, counter):
+        if a == b:
+            root, converged = a, True
+        else:
+            root, f_root, converged, iterations = _brent(residual, a, b, fa, fb, tolerance, max_iterations)
+            counter[0] += iterations
+            # a sign change across a pole (like 1/x at 0) also "converges", but the residual
+            # there is bigger than at either end of the bracket rather than close to zero
+            converged = converged and abs(f_root) <= min(abs(fa), abs(fb))
+        if converged:
+            if root >= 0:
+                return root, True, counter[0]
+            if negative_root is None:
+                negative_root = root
+    if negative_root is not None:
+        return negative_root, True, counter[0]
+    return math.nan, False, counter[0]
+
+
+# tries every residual rule from each start point in turn, keeping the first non-negative
+# root, or the first negative one if that is all there is
+def _numeric_row(residual_specs, row_index, starts, tolerance, max_iterations):
+    negative_root = None
+    iterations = 0
+    for x0 in starts:
+        for kernel, target_position, input_columns, observed_column in residual_specs:
+            arguments = [column[row_index] if column is not None else 0.0 for column in input_columns]
+            observed = observed_column[row_index]
+
+            def residual(x):
+                arguments[target_position] = x
+                return kernel(*arguments) - observed
+
+            root, converged, evaluations = _numeric_root(_guarded(residual), x0, tolerance, max_iterations)
+            iterations += evaluations
+            if converged and root >= 0:
+                return root, True, iterations
+            if converged and negative_root is None:
+                negative_root = root
+    if negative_root is not None:
+        return negative_root, True, iterations
+    return math.nan, False, iterations
+
+
+# solves target for every row from the other variables' columns. each row starts from the
+# previous row's root when it converged (neighbouring rows are usually close) and falls
+# back to initial_guess if that finds nothing, so a row's result doesn't depend on the
+# rows before it. the residual rules are tried in order until one converges.
+# returns (values, converged, iterations) lists, with nan for rows that didn't converge;
+# iterations counts residual evaluations.
+def solve_numeric_batch(equation, target, columns, initial_guess=1.0, tolerance=1e-12, max_iterations=100):
+    residual_rules = find_residual_rules(equation, target)
+    if not residual_rules:
+        raise ValueError(f"No rule of this equation uses {target}, so it can't be solved numerically.")
+
+    residual_specs = []
+    for anchor, solve_rule in residual_rules:
+        inputs = solve_rule["requires"]
+        kernel = solve_rule["kernel"]
+        input_columns = [columns[variable] if variable != target else None for variable in inputs]
+        residual_specs.append((kernel, inputs.index(target), input_columns, columns[anchor]))
+
+    values = []
+    converged = []
+    iterations = []
+    x0 = initial_guess
+    row_count = len(residual_specs[0][3])
+    for row_index in range(row_count):
+        starts = (x0,) if x0 == initial_guess else (x0, initial_guess)
+        root, row_converged, row_iterations = _numeric_row(residual_specs, row_index, starts, tolerance, max_iterations)
+        if row_converged:
+            x0 = root
+
+        values.append(root)
+        converged.append(row_converged)
+        iterations.append(row_iterations)
+    return values, converged, iterations
@@ -0,0 +1,178 @@
+from Physics_Solver import TOPIC_LIBRARY, apply_rule
+
+
+# every variable name gets one bit, so a set of variables is an int and
+# "are all inputs of this rule known" is requires_mask & ~known_mask == 0
+class RuleIndex:
+    def __init__(self, equations):
+        self.variable_bits = {}
+        # (equation, target, solve_rule, requires_mask, target_bit)
+        self.entries = []
+        self.rules_by_variable = {}
+        # (equation, equation_mask, {target_bit: entry})
+        self.equation_entries = []
+
+        for equation in equations:
+            equation_mask = self._assign_bits(equation.variables)
+            rules_by_bit = {}
+            for target, solve_rule in equation.solve_rules.items():
+                requires_mask = self._assign_bits(solve_rule["requires"])
+                target_bit = self._assign_bits([target])
+                entry = (equation, target, solve_rule, requires_mask, target_bit)
+                self.entries.append(entry)
+                self.rules_by_variable.setdefault(target, []).append(entry)
+                rules_by_bit[target_bit] = entry
+            self.equation_entries.append((equation, equation_mask, rules_by_bit))
+
+    def _assign_bits(self, variables):
+        mask = 0
+        for variable in variables:
+            bit = self.variable_bits.get(variable)
+            if bit is None:
+                bit = 1 << len(self.variable_bits)
+                self.variable_bits[variable] = bit
+            mask |= bit
+        return mask
+
+    # names the index has never seen are ignored
+    def mask_of(self, variables):
+        mask = 0
+        for variable in variables:
+            mask |= self.variable_bits.get(variable, 0)
+        return mask
+
+    # rules whose inputs are all known and whose output isn't known yet
+    def fireable_rules(self, known_variables):
+        known_mask = self.mask_of(known_variables)
+        return [
+            entry[:3]
+            for entry in self.entries
+            if not entry[3] & ~known_mask and not entry[4] & known_mask
+        ]
+
+    def rules_producing(self, target, known_variables):
+        known_mask = self.mask_of(known_variables)
+        return [entry[:3] for entry in self.rules_by_variable.get(target, []) if not entry[3] & ~known_mask]
+
+    # equations that can be solved straight away with solve_missing_variable: exactly one
+    # of their variables is unknown and the rule for it has all its inputs
+    def route(self, known_variables):
+        known_mask = self.mask_of(known_variables)
+        routes = []
+        for equation, equation_mask, rules_by_bit in self.equation_entries:
+            missing_mask = equation_mask & ~known_mask
+            if not missing_mask or missing_mask & (missing_mask - 1):
+                continue
+            entry = rules_by_bit.get(missing_mask)
+            if entry is not None and not entry[3] & ~known_mask:
+                routes.append((equation, entry[1]))
+        return routes
+
+
+# chains solve rules across several equations, e.g. v, u and t -> a (1st equation)
+# and then a -> s (2nd equation). variables with the same symbol are treated as the
+# same quantity, so only group equations that agree on their symbols (like one topic).
+class SolvePlanner:
+    def __init__(self, equations):
+        self.equations = list(equations)
+        self.index = RuleIndex(self.equations)
+        self.plan_cache = {}
+
+    # returns a list of (equation, variable, solve_rule) steps, cached per input shape
+    def plan(self, known_variables, target):
+        key = (frozenset(known_variables), target)
+        if key in self.plan_cache:
+            chain = self.plan_cache[key]
+        else:
+            chain = self._search(key[0], target)
+            self.plan_cache[key] = chain
+
+        if chain is None:
+            raise ValueError(f"Cannot solve {target} from the known values with these equations.")
+        return chain
+
+    # returns every known and intermediate value, including the target
+    def solve(self, known_values, target):
+        values = dict(known_values)
+        for _, variable, solve_rule in self.plan(known_values, target):
+            values[variable] = apply_rule(solve_rule, values)
+        return values
+
+    # solves in rounds, every round firing each rule whose inputs are already known, so
+    # the target is reached in the fewest rounds. then walks back from the target keeping
+    # only the steps it depends on.
+    def _search(self, known, target):
+        if target in known:
+            return []
+        target_bit = self.index.variable_bits.get(target)
+        if target_bit is None:
+            return None
+
+        producers = {}
+        available = self.index.mask_of(known)
+        while not available & target_bit:
+            new_mask = 0
+            for entry in self.index.entries:
+                if entry[4] & (available | new_mask) or entry[3] & ~available:
+                    continue
+                producers[entry[1]] = entry
+                new_mask |= entry[4]
+            if not new_mask:
+                return None
+            available |= new_mask
+
+        chain = []
+        visited = set()
+
+        def collect(variable):
+            if variable in known or variable in visited:
+                return
+            visited.add(variable)
+            entry = producers[variable]
+            for required in entry[2]["requires"]:
+                collect(required)
+            chain.append(entry[:3])
+
+        collect(target)
+        return chain
+
+
+# plans over several topics ({topic name: equations}) but keeps every chain inside one
+# topic, since the same symbol can mean different things in different topics (Q is a
+# charge in Electricity and heat in Thermal Physics). the shortest chain found wins.
+class TopicSolvePlanner(SolvePlanner):
+    def __init__(self, topics):
+        self.planners = [SolvePlanner(equations) for equations in topics.values()]
+        super().__init__(equation for planner in self.planners for equation in planner.equations)
+
+    def _search(self, known, target):
+        chains = [planner._search(known, target) for planner in self.planners]
+        return min((chain for chain in chains if chain is not None), key=len, default=None)
+
+
+_SOLVE_PLANNERS = {}
+
+
+def _forget_solve_planners(topic_name, equations):
+    _SOLVE_PLANNERS.pop(topic_name, None)
+    _SOLVE_PLANNERS.pop(None, None)
+
+
+TOPIC_LIBRARY.listeners.append(_forget_solve_planners)
+
+
+# topic_name=None plans over every topic in TOPIC_LIBRARY, one topic per chain. to chain
+# equations from different topics, pass them to SolvePlanner yourself
+def get_solve_planner(topic_name=None):
+    planner = _SOLVE_PLANNERS.get(topic_name)
+    if planner is None:
+        if topic_name is None:
+            planner = TopicSolvePlanner(dict(TOPIC_LIBRARY.items()))
+        else:
+            planner = SolvePlanner(TOPIC_LIBRARY[topic_name])
+        _SOLVE_PLANNERS[topic_name] = planner
+    return planner
+
+
+def get_rule_index(topic_name=None):
+    return get_solve_planner(topic_name).index
@@ -0,0 +1,145 @@
+import bisect
+
+from Physics_Solver import TOPIC_LIBRARY
+
+
+# ranked equation search for the interactive menu. every equation is split into words
+# from its name, topic, variable symbols and variable descriptions, and each word points
+# at the equations it appears in with a weight for where it appeared (a symbol counts
+# more than a word in a description). "solve for theta2" / "find v" asks for equations
+# with that variable. topics are indexed as TOPIC_LIBRARY builds or replaces them.
+_SEARCH_STOP_WORDS = {"solve", "for", "find", "calculate", "the", "of", "what", "is", "how", "to", "with", "and", "in"}
+_SEARCH_TARGET = r"(?i)\b(?:solve|find|calculate)\s+(?:for\s+)?([A-Za-z_][A-Za-z0-9_]*)"
+_SEARCH_WEIGHTS = {"symbol": 4.0, "name": 3.0, "topic": 1.0, "description": 1.0}
+_SEARCH_TARGET_WEIGHT = 6.0
+
+
+def _search_words(text):
+    import re
+
+    return re.findall(r"[a-z0-9_]+", text.lower())
+
+
+class EquationSearchIndex:
+    def __init__(self, library=None):
+        import collections
+
+        self.library = TOPIC_LIBRARY if library is None else library
+        self.documents = {}
+        self.topic_documents = {}
+        self.postings = collections.defaultdict(dict)
+        # symbol -> documents, as written and lowercased
+        self.symbols = collections.defaultdict(set)
+        self.lowercase_symbols = collections.defaultdict(set)
+        # every indexed word, sorted, for prefix lookups
+        self.words = []
+        self.document_words = {}
+        self.next_document = 0
+        self.library.listeners.append(self._topic_changed)
+        self._index_new_topics()
+
+    def _topic_changed(self, topic_name, equations):
+        self.remove_topic(topic_name)
+        if equations is not None:
+            self.add_topic(topic_name, equations)
+
+    def add_topic(self, topic_name, equations):
+        import collections
+
+        self.remove_topic(topic_name)
+        documents = self.topic_documents[topic_name] = []
+        for equation in equations:
+            document = self.next_document
+            self.next_document += 1
+            self.documents[document] = (topic_name, equation)
+            documents.append(document)
+
+            weights = collections.defaultdict(float)
+            for word in _search_words(equation.name):
+                weights[word] = max(weights[word], _SEARCH_WEIGHTS["name"])
+            for word in _search_words(topic_name):
+                weights[word] = max(weights[word], _SEARCH_WEIGHTS["topic"])
+            for variable, description in equation.variables.items():
+                self.symbols[variable].add(document)
+                self.lowercase_symbols[variable.lower()].add(document)
+                weights[variable.lower()] = max(weights[variable.lower()], _SEARCH_WEIGHTS["symbol"])
+                for word in _search_words(description):
+                    weights[word] = max(weights[word], _SEARCH_WEIGHTS["description"])
+
+            for word, weight in weights.items():
+                if word not in self.postings:
+                    bisect.insort(self.words, word)
+                self.postings[word][document] = weight
+            self.document_words[document] = list(weights)
+
+    def remove_topic(self, topic_name):
+        for document in self.topic_documents.pop(topic_name, []):
+            _, equation = self.documents.pop(document)
+            for variable in equation.variables:
+                self.symbols[variable].discard(document)
+                self.lowercase_symbols[variable.lower()].discard(document)
+            for word in self.document_words.pop(document):
+                postings = self.postings[word]
+                del postings[document]
+                if not postings:
+                    del self.postings[word]
+                    del self.words[bisect.bisect_left(self.words, word)]
+
+    # topics registered with a builder since the index was made are built here
+    def _index_new_topics(self):
+        for topic_name in self.library:
+            if topic_name not in self.topic_documents:
+                # building the topic tells _topic_changed, a topic that was already built doesn't
+                equations = self.library[topic_name]
+                if topic_name not in self.topic_documents:
+                    self.add_topic(topic_name, equations)
+
+    # best matches first, as (score, topic name, equation)
+    def search(self, query, limit=10):
+        import collections
+        import re
+
+        self._index_new_topics()
+        scores = collections.defaultdict(float)
+
+        target = re.search(_SEARCH_TARGET, query)
+        if target is not None:
+            # a and A are different variables, so the case only stops mattering if nothing matches it
+            symbol = target.group(1)
+            documents = self.symbols.get(symbol) or self.lowercase_symbols.get(symbol.lower(), ())
+            for document in documents:
+                scores[document] += _SEARCH_TARGET_WEIGHT
+            query = query[: target.start(1)] + query[target.end(1) :]
+
+        for word in _search_words(query):
+            if word in _SEARCH_STOP_WORDS:
+                continue
+            for document, weight in self.postings.get(word, {}).items():
+                scores[document] += weight
+            # "kinet" still finds "kinetic", for less than a whole word
+            if len(word) >= 3:
+                prefix_scores = {}
+                position = bisect.bisect_right(self.words, word)
+                while position < len(self.words) and self.words[position].startswith(word):
+                    for document, weight in self.postings[self.words[position]].items():
+                        prefix_scores[document] = max(prefix_scores.get(document, 0.0), weight / 2)
+                    position += 1
+                for document, score in prefix_scores.items():
+                    scores[document] += score
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        return [(score, *self.documents[document]) for document, score in ranked]
+
+
+_SEARCH_INDEX = None
+
+
+def get_search_index():
+    global _SEARCH_INDEX
+    if _SEARCH_INDEX is None:
+        _SEARCH_INDEX = EquationSearchIndex()
+    return _SEARCH_INDEX
+
+
+def search_equations(query, limit=10):
+    return get_search_index().search(query, limit)
@@ -0,0 +1,196 @@
+import argparse
+import asyncio
+import functools
+import json
+
+from Physics_Solver import (
+    ERROR_NONE,
+    find_equation,
+    load_equation_file,
+    solve_batch_masked,
+    solve_missing_variable,
+)
+
+
+# requests and responses are one JSON object per line:
+#   {"id": 1, "equation": "Ohm's Law", "known": {"V": 12, "I": 2}}
+#   {"id": 1, "variable": "R", "value": 6.0}     or     {"id": 1, "error": "..."}
+#
+# requests that arrive close together are solved together: the batcher drains everything
+# that is queued (waiting up to max_delay for more), groups it by equation and known
+# variables, and solves each group with one solve_batch_masked call.
+class MicroBatcher:
+    def __init__(self, max_batch_size=512, max_delay=0.0005):
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.queue = asyncio.Queue()
+        self.equations = {}
+        self.batches = 0
+        self.requests = 0
+
+    def submit(self, request):
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((request, future))
+        return future
+
+    async def run(self):
+        while True:
+            batch = [await self.queue.get()]
+            self._drain_into(batch)
+            if len(batch) < self.max_batch_size and self.max_delay > 0:
+                await asyncio.sleep(self.max_delay)
+                self._drain_into(batch)
+            try:
+                self.solve(batch)
+            except Exception as error:
+                # a bug in one batch must not stop the batcher: fail that batch's requests and keep going
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+
+    def _drain_into(self, batch):
+        while len(batch) < self.max_batch_size and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+
+    def find_equation(self, name):
+        equation = self.equations.get(name)
+        if equation is None:
+            equation = find_equation(name)
+            self.equations[name] = equation
+        return equation
+
+    def solve(self, batch):
+        self.batches += 1
+        self.requests += len(batch)
+        groups = {}
+        for request, future in batch:
+            try:
+                equation = self.find_equation(request["equation"])
+                known_values = {variable: float(value) for variable, value in request["known"].items()}
+            except (KeyError, TypeError, AttributeError):
+                future.set_result({"id": _request_id(request), "error": "Request needs equation and known."})
+                continue
+            except (ArithmeticError, ValueError) as error:
+                future.set_result({"id": _request_id(request), "error": str(error)})
+                continue
+            key = (equation, frozenset(known_values))
+            groups.setdefault(key, []).append((request, future, known_values))
+
+        for (equation, known_variables), members in groups.items():
+            self.solve_group(equation, known_variables, members)
+
+    def solve_group(self, equation, known_variables, members):
+        columns = {variable: [known_values[variable] for _, _, known_values in members] for variable in known_variables}
+        try:
+            variable, values, codes = solve_batch_masked(equation, columns)
+        except (ArithmeticError, ValueError) as error:
+            for request, future, known_values in members:
+                future.set_result(_solve_one(request, equation, known_values))
+            return
+
+        for (request, future, known_values), value, code in zip(members, values, codes):
+            if code == ERROR_NONE:
+                future.set_result({"id": _request_id(request), "variable": variable, "value": value})
+            else:
+                # solve the bad row again the normal way to get its full error message
+                future.set_result(_solve_one(request, equation, known_values))
+
+
+def _request_id(request):
+    return request.get("id") if isinstance(request, dict) else None
+
+
+def _solve_one(request, equation, known_values):
+    try:
+        variable, value = solve_missing_variable(equation, known_values)
+    except ZeroDivisionError:
+        return {"id": _request_id(request), "error": "division by zero occurred."}
+    except OverflowError:
+        return {"id": _request_id(request), "error": "the result is too large."}
+    except (ArithmeticError, ValueError) as error:
+        return {"id": _request_id(request), "error": str(error)}
+    return {"id": _request_id(request), "variable": variable, "value": value}
+
+
+def make_connection_handler(batcher):
+    async def handle_connection(reader, writer):
+        pending = set()
+
+        def write_response(request_id, future):
+            pending.discard(future)
+            if writer.is_closing() or future.cancelled():
+                return
+            if future.exception() is not None:
+                response = {"id": request_id, "error": f"Internal error: {future.exception()}"}
+            else:
+                response = future.result()
+            writer.write((json.dumps(response) + "\n").encode())
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    writer.write(b'{"id": null, "error": "Request is not valid JSON."}\n')
+                    continue
+                future = batcher.submit(request)
+                pending.add(future)
+                future.add_done_callback(functools.partial(write_response, _request_id(request)))
+                await writer.drain()
+            # the client may stop sending before all its answers are back
+            if pending:
+                await asyncio.wait(list(pending))
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    return handle_connection
+
+
+async def serve(args):
+    batcher = MicroBatcher(args.max_batch_size, args.max_delay_ms / 1000)
+    handler = make_connection_handler(batcher)
+    if args.unix:
+        server = await asyncio.start_unix_server(handler, path=args.unix)
+        where = args.unix
+    else:
+        server = await asyncio.start_server(handler, host=args.host, port=args.port)
+        where = f"{args.host}:{args.port}"
+
+    print(f"Physics solver listening on {where}", flush=True)
+    batch_task = asyncio.create_task(batcher.run())
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        batch_task.cancel()
+        if batcher.batches:
+            print(f"Solved {batcher.requests} requests in {batcher.batches} batches "
+                  f"({batcher.requests / batcher.batches:.1f} per batch)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the physics solver over TCP or a Unix socket.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="listen on this Unix socket path instead of TCP")
+    parser.add_argument("--max-batch-size", type=int, default=512)
+    parser.add_argument("--max-delay-ms", type=float, default=0.5, help="how long to wait for a batch to fill up")
+    parser.add_argument("--equations-file", action="append", default=[], help="JSON file of extra equations to load")
+    args = parser.parse_args()
+
+    for path in args.equations_file:
+        load_equation_file(path)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
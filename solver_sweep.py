@@ -0,0 +1,139 @@
+import array
+import json
+import mmap
+import os
+import sys
+
+from Physics_Solver import find_solve_rule, solve_batch_masked
+
+
+# evenly spaced values including both ends, like numpy.linspace
+def linspace(start, stop, count):
+    if count == 1:
+        return [float(start)]
+    step = (stop - start) / (count - 1)
+    return [start + step * index for index in range(count)]
+
+
+class SweepResult:
+    def __init__(self, path):
+        with open(path + ".json", encoding="utf-8") as metadata_file:
+            self.metadata = json.load(metadata_file)
+        if self.metadata["byteorder"] != sys.byteorder:
+            raise ValueError(f"{path} was written on a {self.metadata['byteorder']}-endian machine.")
+
+        self.shape = tuple(self.metadata["shape"])
+        self.axes = self.metadata["axes"]
+        self.complete = self.metadata["completed_rows"] == _cell_count(self.shape)
+        self._files = [open(path, "rb"), open(path + ".codes", "rb")]
+        if _cell_count(self.shape) == 0:
+            # an empty file can't be mapped, and a view can't have a 0 in its shape
+            self._maps = []
+            self.values = memoryview(array.array("d"))
+            self.codes = memoryview(b"")
+            return
+        self._maps = [mmap.mmap(opened.fileno(), 0, access=mmap.ACCESS_READ) for opened in self._files]
+        # values[i, j, ...] and codes[i, j, ...] index the grid in the order of metadata["variables"]
+        self.values = memoryview(self._maps[0]).cast("d", self.shape)
+        self.codes = memoryview(self._maps[1]).cast("B", self.shape)
+
+    def close(self):
+        self.values.release()
+        self.codes.release()
+        for mapped in self._maps:
+            mapped.close()
+        for opened in self._files:
+            opened.close()
+
+
+def _cell_count(shape):
+    count = 1
+    for size in shape:
+        count *= size
+    return count
+
+
+def _read_metadata(path):
+    try:
+        with open(path + ".json", encoding="utf-8") as metadata_file:
+            return json.load(metadata_file)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_metadata(path, metadata):
+    temporary_path = path + ".json.tmp"
+    with open(temporary_path, "w", encoding="utf-8") as metadata_file:
+        json.dump(metadata, metadata_file)
+    os.replace(temporary_path, path + ".json")
+
+
+def _open_mapped(path, size):
+    mode = "r+b" if os.path.exists(path) else "w+b"
+    opened = open(path, mode)
+    if os.path.getsize(path) != size:
+        opened.truncate(size)
+    return opened, mmap.mmap(opened.fileno(), size)
+
+
+# solves equation over every combination of the given axis values. results are written
+# straight into a memory-mapped float64 file at `path` (C order, axes in the equation's
+# variable order) with a matching one-byte-per-cell ERROR_* code file at path + ".codes",
+# so the grid can be bigger than RAM. progress is saved in path + ".json" after every
+# chunk, and running the same sweep again picks up where an interrupted run stopped.
+def run_sweep(equation, axes, path, chunk_rows=65536, progress=None):
+    target, _ = find_solve_rule(equation, axes)
+    variables = [variable for variable in equation.variables if variable in axes]
+    axis_values = [[float(value) for value in axes[variable]] for variable in variables]
+    shape = [len(values) for values in axis_values]
+    total = _cell_count(shape)
+
+    metadata = {
+        "equation": equation.name,
+        "target": target,
+        "variables": variables,
+        "axes": axis_values,
+        "shape": shape,
+        "byteorder": sys.byteorder,
+        "completed_rows": 0,
+    }
+    previous = _read_metadata(path)
+    if previous is not None and {**previous, "completed_rows": 0} == metadata:
+        metadata["completed_rows"] = previous["completed_rows"]
+
+    if total == 0:
+        # an axis with no values: nothing to solve, and an empty file can't be mapped
+        for empty_path in (path, path + ".codes"):
+            open(empty_path, "wb").close()
+        _write_metadata(path, metadata)
+        return SweepResult(path)
+
+    strides = [_cell_count(shape[index + 1:]) for index in range(len(shape))]
+    values_file, values_map = _open_mapped(path, total * 8)
+    codes_file, codes_map = _open_mapped(path + ".codes", total)
+    try:
+        start = metadata["completed_rows"]
+        while start < total:
+            end = min(start + chunk_rows, total)
+            columns = {
+                variable: [values[(cell // stride) % size] for cell in range(start, end)]
+                for variable, values, stride, size in zip(variables, axis_values, strides, shape)
+            }
+            _, solved, codes = solve_batch_masked(equation, columns)
+            values_map[start * 8:end * 8] = array.array("d", solved).tobytes()
+            codes_map[start:end] = bytes(codes)
+
+            # data is on disk before the progress that says so
+            values_map.flush()
+            codes_map.flush()
+            metadata["completed_rows"] = end
+            _write_metadata(path, metadata)
+            if progress is not None:
+                progress(end, total)
+            start = end
+    finally:
+        values_map.close()
+        codes_map.close()
+        values_file.close()
+        codes_file.close()
+    return SweepResult(path)
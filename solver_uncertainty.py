@@ -0,0 +1,95 @@
+import math
+import random
+import statistics
+
+from Physics_Solver import ERROR_DESCRIPTIONS, ERROR_NONE, find_solve_rule, solve_batch_masked
+
+
+# a known value can be a plain number or one of these. each draws all of its samples in
+# one call so the whole run is one column per variable.
+class Normal:
+    def __init__(self, mean, std):
+        self.mean = mean
+        self.std = std
+
+    def sample(self, rng, count):
+        gauss = rng.gauss
+        return [gauss(self.mean, self.std) for _ in range(count)]
+
+
+class Uniform:
+    def __init__(self, low, high):
+        self.low = low
+        self.high = high
+
+    def sample(self, rng, count):
+        uniform = rng.uniform
+        return [uniform(self.low, self.high) for _ in range(count)]
+
+
+# resamples measured values with replacement
+class Empirical:
+    def __init__(self, samples):
+        self.samples = list(samples)
+        if not self.samples:
+            raise ValueError("Empirical distribution needs at least one sample.")
+
+    def sample(self, rng, count):
+        return rng.choices(self.samples, k=count)
+
+
+class UncertaintyResult:
+    def __init__(self, variable, values, codes, percentiles):
+        valid = sorted(value for value, code in zip(values, codes) if code == ERROR_NONE)
+        self.variable = variable
+        self.samples = len(values)
+        self.valid_samples = len(valid)
+        self.error_counts = {}
+        for code in codes:
+            if code != ERROR_NONE:
+                self.error_counts[code] = self.error_counts.get(code, 0) + 1
+
+        self.mean = statistics.fmean(valid) if valid else math.nan
+        self.std = statistics.stdev(valid, self.mean) if len(valid) > 1 else math.nan
+        self.percentiles = {percentile: _percentile(valid, percentile) for percentile in percentiles}
+
+    def summary(self):
+        lines = [
+            f"{self.variable}: mean {self.mean:.6g}, std {self.std:.6g} "
+            f"({self.valid_samples}/{self.samples} samples solved)"
+        ]
+        for percentile, value in self.percentiles.items():
+            lines.append(f"  p{percentile:g}: {value:.6g}")
+        for code, count in sorted(self.error_counts.items()):
+            lines.append(f"  {count} samples failed: {ERROR_DESCRIPTIONS[code]}")
+        return "\n".join(lines)
+
+
+# linear interpolation between the closest ranks, same as numpy's default
+def _percentile(sorted_values, percentile):
+    if not sorted_values:
+        return math.nan
+    position = (len(sorted_values) - 1) * percentile / 100
+    lower = math.floor(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    fraction = position - lower
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * fraction
+
+
+# draws `samples` values for every known variable, solves the blank one for all of them in
+# one solve_batch_masked call and summarises the spread. samples that hit a solver error
+# are counted in error_counts instead of stopping the run.
+def propagate_uncertainty(equation, known, samples=100000, seed=None, percentiles=(2.5, 50, 97.5)):
+    find_solve_rule(equation, known)
+    rng = random.Random(seed)
+    columns = {}
+    for variable, value in known.items():
+        if variable not in equation.variables:
+            continue
+        if hasattr(value, "sample"):
+            columns[variable] = value.sample(rng, samples)
+        else:
+            columns[variable] = [float(value)] * samples
+
+    variable, values, codes = solve_batch_masked(equation, columns)
+    return UncertaintyResult(variable, values, codes, percentiles)
@@ -0,0 +1,262 @@
+import math
+
+
+# every variable description ends in its SI unit, like "Final velocity (m/s)", and
+# values may come in with another unit, like "36 km/h" or "20 degC". a unit is parsed into
+# (factor, offset, dimensions) where value * factor + offset is the value in base SI units,
+# and a conversion between two units is compiled into one (factor, offset) pair and cached,
+# so converting a column is a single multiply-add per value.
+_DIMENSIONS = ("m", "kg", "s", "A", "K", "mol", "cd", "rad")
+
+
+def _dimension(**powers):
+    return tuple(powers.get(name, 0) for name in _DIMENSIONS)
+
+
+_NEWTON = _dimension(m=1, kg=1, s=-2)
+_JOULE = _dimension(m=2, kg=1, s=-2)
+_WATT = _dimension(m=2, kg=1, s=-3)
+_VOLT = _dimension(m=2, kg=1, s=-3, A=-1)
+
+# name: (factor, offset, dimensions, takes SI prefixes)
+UNITS = {
+    "1": (1.0, 0.0, _dimension(), False),
+    "m": (1.0, 0.0, _dimension(m=1), True),
+    "g": (1e-3, 0.0, _dimension(kg=1), True),
+    "s": (1.0, 0.0, _dimension(s=1), True),
+    "A": (1.0, 0.0, _dimension(A=1), True),
+    "K": (1.0, 0.0, _dimension(K=1), True),
+    "mol": (1.0, 0.0, _dimension(mol=1), True),
+    "cd": (1.0, 0.0, _dimension(cd=1), False),
+    "rad": (1.0, 0.0, _dimension(rad=1), True),
+    "deg": (math.pi / 180, 0.0, _dimension(rad=1), False),
+    "degC": (1.0, 273.15, _dimension(K=1), False),
+    "degF": (5 / 9, 273.15 - 32 * 5 / 9, _dimension(K=1), False),
+    "min": (60.0, 0.0, _dimension(s=1), False),
+    "h": (3600.0, 0.0, _dimension(s=1), False),
+    "day": (86400.0, 0.0, _dimension(s=1), False),
+    "L": (1e-3, 0.0, _dimension(m=3), True),
+    "t": (1e3, 0.0, _dimension(kg=1), False),
+    "in": (0.0254, 0.0, _dimension(m=1), False),
+    "ft": (0.3048, 0.0, _dimension(m=1), False),
+    "mi": (1609.344, 0.0, _dimension(m=1), False),
+    "lb": (0.45359237, 0.0, _dimension(kg=1), False),
+    "mph": (0.44704, 0.0, _dimension(m=1, s=-1), False),
+    "kph": (1 / 3.6, 0.0, _dimension(m=1, s=-1), False),
+    "N": (1.0, 0.0, _NEWTON, True),
+    "J": (1.0, 0.0, _JOULE, True),
+    "eV": (1.602176634e-19, 0.0, _JOULE, True),
+    "cal": (4.184, 0.0, _JOULE, True),
+    "W": (1.0, 0.0, _WATT, True),
+    "Wh": (3600.0, 0.0, _JOULE, True),
+    "Pa": (1.0, 0.0, _dimension(m=-1, kg=1, s=-2), True),
+    "bar": (1e5, 0.0, _dimension(m=-1, kg=1, s=-2), True),
+    "atm": (101325.0, 0.0, _dimension(m=-1, kg=1, s=-2), False),
+    "Hz": (1.0, 0.0, _dimension(s=-1), True),
+    "C": (1.0, 0.0, _dimension(s=1, A=1), True),
+    "V": (1.0, 0.0, _VOLT, True),
+    "ohm": (1.0, 0.0, _dimension(m=2, kg=1, s=-3, A=-2), True),
+}
+
+# written out differently, replaced in the unit text before it is split up
+_UNIT_SPELLINGS = [("°C", "degC"), ("°F", "degF"), ("deg C", "degC"), ("deg F", "degF"), ("°", "deg"), ("Ω", "ohm")]
+_UNIT_SPELLINGS += [("²", "^2"), ("³", "^3")]
+
+_UNIT_ALIASES = {"degrees": "deg", "degree": "deg", "ohms": "ohm", "hr": "h", "sec": "s", "l": "L"}
+
+_UNIT_PREFIXES = {"G": 1e9, "M": 1e6, "k": 1e3, "c": 1e-2, "m": 1e-3, "u": 1e-6, "µ": 1e-6, "n": 1e-9}
+
+_UNIT_TOKEN = r"\s*(?:([A-Za-zµ]+|1)(?:\^([-+]?\d+))?|([*/·]))"
+
+# parsed units, conversions and description units, filled in as they are first used
+_UNIT_CACHE = {}
+_CONVERSION_CACHE = {}
+_DESCRIPTION_UNIT_CACHE = {}
+
+
+def _unit_entry(name):
+    name = _UNIT_ALIASES.get(name, name)
+    entry = UNITS.get(name)
+    if entry is None and len(name) > 1 and name[0] in _UNIT_PREFIXES:
+        base = UNITS.get(name[1:])
+        if base is not None and base[3]:
+            entry = (base[0] * _UNIT_PREFIXES[name[0]], 0.0, base[2], False)
+    if entry is None:
+        raise ValueError(f"Unknown unit: {name!r}")
+    return entry
+
+
+# "kg m/s", "J/kg/K", "m/s^2" and "N m" all work: a space or * multiplies and a / divides
+# by the one unit after it. an offset (degC, degF) only counts when the unit is on its own,
+# inside a compound unit like J/degC it is a temperature difference
+def parse_unit(unit):
+    parsed = _UNIT_CACHE.get(unit)
+    if parsed is None:
+        parsed = _UNIT_CACHE[unit] = _parse_unit(unit)
+    return parsed
+
+
+def _parse_unit(unit):
+    import re
+
+    unit_token = re.compile(_UNIT_TOKEN)
+    text = unit.strip()
+    for spelling, replacement in _UNIT_SPELLINGS:
+        text = text.replace(spelling, replacement)
+    if text == "":
+        return 1.0, 0.0, _dimension()
+
+    factor = 1.0
+    dimensions = [0] * len(_DIMENSIONS)
+    terms = []
+    divide = False
+    position = 0
+    while position < len(text):
+        match = unit_token.match(text, position)
+        if match is None or match.end() == position:
+            raise ValueError(f"Cannot parse unit: {unit!r}")
+        position = match.end()
+        name, power, operator = match.groups()
+        if operator is not None:
+            divide = operator == "/"
+            continue
+        power = int(power or 1) * (-1 if divide else 1)
+        divide = False
+        entry = _unit_entry(name)
+        terms.append((entry, power))
+        factor *= entry[0] ** power
+        for index, exponent in enumerate(entry[2]):
+            dimensions[index] += exponent * power
+
+    offset = terms[0][0][1] if len(terms) == 1 and terms[0][1] == 1 else 0.0
+    return factor, offset, tuple(dimensions)
+
+
+# value_in_target = value_in_source * factor + offset
+def compile_unit_conversion(source, target):
+    conversion = _CONVERSION_CACHE.get((source, target))
+    if conversion is None:
+        conversion = _CONVERSION_CACHE[source, target] = _compile_unit_conversion(source, target)
+    return conversion
+
+
+def _compile_unit_conversion(source, target):
+    source_factor, source_offset, source_dimensions = parse_unit(source)
+    target_factor, target_offset, target_dimensions = parse_unit(target)
+    if source_dimensions != target_dimensions:
+        raise ValueError(f"Cannot convert {source} to {target}.")
+    return source_factor / target_factor, (source_offset - target_offset) / target_factor
+
+
+def _unit_offset(unit):
+    try:
+        return parse_unit(unit)[1]
+    except ValueError:
+        return 0.0
+
+
+# (unit, lists an offset unit) for the last (...) of a description. when it lists
+# alternatives like "(K or deg C)" the unit is the first one without an offset, and the
+# quantity is a difference, since only a difference is the same number in K and deg C
+def _description_units(description):
+    units = _DESCRIPTION_UNIT_CACHE.get(description)
+    if units is None:
+        import re
+
+        found = re.findall(r"\(([^()]*)\)", description)
+        alternatives = [unit.strip() for unit in found[-1].split(" or ")] if found else [""]
+        offsets = [_unit_offset(unit) for unit in alternatives]
+        unit = next((unit for unit, offset in zip(alternatives, offsets) if offset == 0.0), alternatives[0])
+        units = _DESCRIPTION_UNIT_CACHE[description] = (unit, len(alternatives) > 1 and any(offsets))
+    return units
+
+
+# the unit in the last (...) of a description. descriptions without one, like
+# "Primary turns", are plain numbers
+def description_unit(description):
+    return _description_units(description)[0]
+
+
+def variable_unit(equation, variable):
+    return description_unit(equation.variables[variable])
+
+
+# delta_T and friends are temperature changes, so "20 degC" is 20 K and not 293.15 K
+def is_difference_variable(equation, variable):
+    return variable.startswith("delta_") or _description_units(equation.variables[variable])[1]
+
+
+# (factor, offset) from unit to the variable's own unit, without the offset for differences
+def variable_conversion(equation, variable, unit):
+    if unit == "":
+        return 1.0, 0.0
+    factor, offset = compile_unit_conversion(unit, variable_unit(equation, variable))
+    if is_difference_variable(equation, variable):
+        return factor, 0.0
+    return factor, offset
+
+
+_QUANTITY = r"(?i)\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?|[-+]?inf|nan)\s*(.*?)\s*$"
+
+
+# "36 km/h" -> (36.0, "km/h"), "2.5" -> (2.5, "")
+def parse_quantity(text):
+    import re
+
+    match = re.match(_QUANTITY, text)
+    if match is None:
+        raise ValueError(f"Invalid quantity: {text!r}")
+    return float(match.group(1)), match.group(2)
+
+
+def convert_quantity(text, target_unit):
+    value, unit = parse_quantity(text)
+    if unit == "":
+        return value
+    factor, offset = compile_unit_conversion(unit, target_unit)
+    return value * factor + offset
+
+
+def convert_column(values, factor, offset=0.0):
+    if offset == 0.0:
+        if factor == 1.0:
+            return list(values)
+        return [value * factor for value in values]
+    return [value * factor + offset for value in values]
+
+
+# columns whose unit is given in units ({"v": "km/h", "T1": "degC"}) are converted to the
+# equation's SI units, the others are passed through as they are
+def convert_columns(equation, columns, units):
+    converted = {}
+    for variable, column in columns.items():
+        unit = units.get(variable)
+        if unit is None:
+            converted[variable] = column
+            continue
+        factor, offset = variable_conversion(equation, variable, unit)
+        converted[variable] = convert_column(column, factor, offset)
+    return converted
+
+
+# for columns of raw cells where every cell may carry its own unit ("36 km/h", "12 m/s",
+# "7.5"). bare numbers are already in target_unit. each distinct unit is looked up once
+def parse_quantity_column(raw_values, target_unit):
+    import re
+
+    quantity = re.compile(_QUANTITY)
+    conversions = {"": (1.0, 0.0)}
+    values = []
+    for raw_value in raw_values:
+        if not isinstance(raw_value, str):
+            values.append(float(raw_value))
+            continue
+        match = quantity.match(raw_value)
+        if match is None:
+            raise ValueError(f"Invalid quantity: {raw_value!r}")
+        number, unit = match.groups()
+        conversion = conversions.get(unit)
+        if conversion is None:
+            conversion = conversions[unit] = compile_unit_conversion(unit, target_unit)
+        values.append(float(number) * conversion[0] + conversion[1])
+    return values
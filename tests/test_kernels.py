@@ -0,0 +1,124 @@
+import itertools
+import math
+import os
+
+import pytest
+
+from Physics_Solver import (
+    ERROR_NONE,
+    ERROR_NOT_A_NUMBER,
+    ERROR_OTHER,
+    TOPIC_LIBRARY,
+    TopicLibrary,
+    find_equation,
+    get_masked_kernel,
+    load_equation_file,
+    solve_batch,
+    solve_batch_masked,
+    solve_missing_variable,
+)
+
+EDGE_VALUES = [2.0, 3.5, 0.0, -1.5, 1e200, math.inf]
+EQUATIONS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "extra_equations.json")
+
+
+def _declared_equations():
+    library = TopicLibrary()
+    load_equation_file(EQUATIONS_FILE, library=library, use_cache=False)
+    return [equation for topic_name in library for equation in library[topic_name]]
+
+
+def _cases(equations):
+    return [
+        pytest.param(equation, target, id=f"{equation.name}-{target}")
+        for equation in equations
+        for target in equation.solve_rules
+    ]
+
+
+BUILT_IN = _cases([equation for topic_name in TOPIC_LIBRARY for equation in TOPIC_LIBRARY[topic_name]])
+DECLARED = _cases(_declared_equations())
+
+
+def _outcome(function, *args):
+    try:
+        return function(*args)
+    except (ArithmeticError, ValueError) as error:
+        return type(error)
+
+
+def _same(first, second):
+    if isinstance(first, float) and isinstance(second, float) and first != first:
+        return second != second
+    return first == second
+
+
+def _rows(rule):
+    # every combination of two ordinary values, then every input set to each edge value in turn
+    requires = rule["requires"]
+    rows = list(itertools.product(EDGE_VALUES[:2], repeat=len(requires)))
+    for position, value in itertools.product(range(len(requires)), EDGE_VALUES):
+        row = [EDGE_VALUES[0]] * len(requires)
+        row[position] = value
+        rows.append(tuple(row))
+    return rows
+
+
+def _check_rule(equation, target):
+    rule = equation.solve_rules[target]
+    masked = get_masked_kernel(rule)
+    for row in _rows(rule):
+        known = dict(zip(rule["requires"], row))
+        scalar = _outcome(lambda: solve_missing_variable(equation, known)[1])
+        assert _same(_outcome(rule["kernel"], *row), scalar), (row, scalar)
+        assert _same(_outcome(rule["formula"], known), scalar), (row, scalar)
+
+        columns = {variable: [value] for variable, value in known.items()}
+        batch = _outcome(lambda: solve_batch(equation, columns)[1][0])
+        assert _same(batch, scalar), (row, scalar)
+
+        _, (value,), (code,) = solve_batch_masked(equation, columns)
+        if isinstance(scalar, type):
+            assert value != value and code != ERROR_NONE, (row, scalar)
+        elif scalar != scalar:
+            assert value != value and code == ERROR_NOT_A_NUMBER, row
+        else:
+            assert value == scalar and code == ERROR_NONE, row
+
+        # the masked kernel on its own: same value where the row solves, nan where it fails
+        result = masked(*row)
+        if isinstance(scalar, type) or scalar != scalar:
+            assert result != result, row
+        else:
+            assert result == scalar, row
+
+
+@pytest.mark.parametrize("equation, target", BUILT_IN)
+def test_built_in_kernels_match_the_scalar_path(equation, target):
+    _check_rule(equation, target)
+
+
+@pytest.mark.parametrize("equation, target", DECLARED)
+def test_declared_kernels_match_the_scalar_path(equation, target):
+    _check_rule(equation, target)
+
+
+def test_overflow_raises_in_every_mode():
+    equation = find_equation("Kinetic Energy")
+    with pytest.raises(OverflowError):
+        solve_missing_variable(equation, {"m": 1.0, "v": 1e200})
+    with pytest.raises(OverflowError):
+        solve_batch(equation, {"m": [1.0], "v": [1e200]})
+
+    _, values, codes = solve_batch_masked(equation, {"m": [1.0, 2.0], "v": [1e200, 3.0]})
+    assert math.isnan(values[0]) and codes[0] == ERROR_OTHER
+    assert values[1] == 9.0 and codes[1] == ERROR_NONE
+
+
+def test_inf_times_zero_is_nan_in_every_mode():
+    equation = find_equation("Ohm's Law")
+    assert math.isnan(solve_missing_variable(equation, {"I": math.inf, "R": 0.0})[1])
+    assert math.isnan(solve_batch(equation, {"I": [math.inf], "R": [0.0]})[1][0])
+
+    _, values, codes = solve_batch_masked(equation, {"I": [math.inf], "R": [0.0]})
+    assert math.isnan(values[0]) and codes == [ERROR_NOT_A_NUMBER]
@@ -0,0 +1,47 @@
+import math
+
+import pytest
+
+from Physics_Solver import ERROR_DIVISION_BY_ZERO, find_equation, solve_batch, solve_batch_masked
+
+
+class NumpyLikeFloat(float):
+    # np.float64 gives inf (and a RuntimeWarning) for x / 0 instead of raising
+    def __truediv__(self, other):
+        return math.inf if other == 0 else float(self) / other
+
+    def __rtruediv__(self, other):
+        return math.inf if self == 0 else other / float(self)
+
+
+class NumpyLikeArray:
+    def __init__(self, values):
+        self.values = [NumpyLikeFloat(value) for value in values]
+
+    def __len__(self):
+        return len(self.values)
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def __getitem__(self, index):
+        return self.values[index]
+
+
+def test_array_columns_raise_like_lists():
+    equation = find_equation("1st Equation")
+    columns = {variable: NumpyLikeArray([1.0, 0.0]) for variable in ("v", "u", "t")}
+    with pytest.raises(ZeroDivisionError):
+        solve_batch(equation, columns)
+
+    target, values, codes = solve_batch_masked(equation, columns)
+    assert target == "a"
+    assert values[0] == 0.0 and math.isnan(values[1])
+    assert codes == [0, ERROR_DIVISION_BY_ZERO]
+
+
+def test_array_columns_solve_like_lists():
+    equation = find_equation("1st Equation")
+    columns = {"u": [1.0, 2.0], "a": [3.0, 4.0], "t": [5.0, 6.0]}
+    arrays = {variable: NumpyLikeArray(column) for variable, column in columns.items()}
+    assert solve_batch(equation, arrays) == solve_batch(equation, columns) == ("v", [16.0, 26.0])
@@ -0,0 +1,60 @@
+import json
+import sqlite3
+
+from Physics_Solver import EquationDefinition, TopicLibrary, load_equation_file, make_rule
+from solver_cache import PersistentSolveCache
+
+
+def _doubling(factor):
+    return EquationDefinition(
+        name="Scaled",
+        variables={"x": "Input", "y": "Output"},
+        solve_rules={"y": make_rule(["x"], lambda x: factor * x)},
+    )
+
+
+def _load_scaled(tmp_path, formula):
+    path = tmp_path / "scaled.json"
+    path.write_text(json.dumps({
+        "topics": {"Scaling": [{"name": "Scaled", "variables": {"x": "Input", "y": "Output"}, "formulas": {"y": formula}}]}
+    }))
+    library = TopicLibrary()
+    load_equation_file(str(path), library=library)
+    return library["Scaling"][0]
+
+
+def test_edited_formula_is_not_served_from_the_cache(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = PersistentSolveCache(path)
+    assert cache.solve(_doubling(2), {"x": 5.0}) == ("y", 10.0)
+    cache.close()
+
+    cache = PersistentSolveCache(path)
+    assert cache.solve(_doubling(3), {"x": 5.0}) == ("y", 15.0)
+    assert cache.solve_batch(_doubling(3), {"x": [5.0, 6.0]})[1] == [15.0, 18.0]
+    assert cache.solve(_doubling(2), {"x": 5.0}) == ("y", 10.0)
+    assert cache.stats()["hits"] == 2
+    cache.close()
+
+
+def test_edited_equation_file_is_not_served_from_the_cache(tmp_path):
+    cache = PersistentSolveCache(str(tmp_path / "cache.db"))
+    assert cache.solve(_load_scaled(tmp_path, "2 * x"), {"x": 5.0}) == ("y", 10.0)
+    assert cache.solve(_load_scaled(tmp_path, "3 * x"), {"x": 5.0}) == ("y", 15.0)
+    cache.close()
+
+
+def test_eviction_keeps_the_file_bounded(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = PersistentSolveCache(path, max_entries=10)
+    equation = _doubling(2)
+    for value in range(25):
+        cache.solve(equation, {"x": float(value)})
+    cache.solve_batch(equation, {"x": [float(value) for value in range(100, 140)]})
+    cache.close()
+
+    with sqlite3.connect(path) as connection:
+        (size,) = connection.execute("SELECT COUNT(*) FROM solve_results").fetchone()
+    assert size <= 10
+    # the most recent rows are the ones kept
+    assert PersistentSolveCache(path, max_entries=10).solve_batch(equation, {"x": [139.0]})[1] == [278.0]
@@ -0,0 +1,49 @@
+import asyncio
+
+from solver_server import MicroBatcher
+
+
+async def _solve_in_turn(batcher, requests):
+    task = asyncio.create_task(batcher.run())
+    try:
+        responses = []
+        for request in requests:
+            responses.append(await asyncio.wait_for(batcher.submit(request), timeout=5))
+        return responses
+    finally:
+        task.cancel()
+
+
+def test_overflow_request_does_not_stop_the_batcher():
+    overflow, normal = asyncio.run(_solve_in_turn(MicroBatcher(), [
+        {"id": 1, "equation": "Kinetic Energy", "known": {"m": 1, "v": 1e200}},
+        {"id": 2, "equation": "Ohm's Law", "known": {"V": 12, "I": 2}},
+    ]))
+    assert overflow["id"] == 1 and "error" in overflow
+    assert normal == {"id": 2, "variable": "R", "value": 6.0}
+
+
+def test_failing_batch_fails_only_its_own_requests():
+    batcher = MicroBatcher()
+    solve = batcher.solve
+
+    def solve_once_broken(batch):
+        batcher.solve = solve
+        raise RuntimeError("broken batch")
+
+    batcher.solve = solve_once_broken
+
+    async def run():
+        task = asyncio.create_task(batcher.run())
+        try:
+            first = batcher.submit({"id": 1, "equation": "Ohm's Law", "known": {"V": 12, "I": 2}})
+            await asyncio.wait([first], timeout=5)
+            second = await asyncio.wait_for(
+                batcher.submit({"id": 2, "equation": "Ohm's Law", "known": {"V": 12, "R": 6}}), timeout=5)
+            return first, second
+        finally:
+            task.cancel()
+
+    first, second = asyncio.run(run())
+    assert isinstance(first.exception(), RuntimeError)
+    assert second == {"id": 2, "variable": "I", "value": 2.0}